@@ -1,26 +1,33 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from datetime import timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from database import SessionLocal
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from database import get_db, get_read_db
+from cache import TTLCache
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, stream_ndjson
+from search import search_index
+from serialization import FastJSONResponse, json_response
+from etag import conditional_get
 from models import Users
-from passlib.context import CryptContext
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import jwt, JWTError
+from hashing import hash_password, verify_password
+from importer import ImportResult, import_users
+from permissions import Permission, require_permissions
+from tokens import (ACCESS_TOKEN_EXPIRE_MINUTES, PRINCIPAL_CACHE_SIZE, create_access_token,
+                    decode_token, oauth2_bearer, token_cache)
+from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter(
     prefix="/auth",
     tags=["auth"]
 )
 
-# JWT settings
-SECRET_KEY = "your_secret_key"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Security
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/login")  # matches route
+# Principal cache: users by "sub" (decoded tokens are cached in tokens.py)
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
 
 # Schemas
 class UserCreate(BaseModel):
@@ -40,52 +47,78 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True  # Pydantic v2 compatible
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# JWT creation function
-def create_access_token(data: dict, expires_delta: timedelta):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+# Drop a cached principal after the user is modified or disabled
+def invalidate_user(username: str) -> None:
+    principal_cache.invalidate(username)
+
+# Keep the principal cache in sync with ORM writes to users
+@event.listens_for(Users, "after_update")
+@event.listens_for(Users, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    invalidate_user(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        invalidate_user(old_username)
+
+def _detached_copy(user: Users) -> Users:
+    # Cached principals must not be bound to the session that loaded them
+    columns = {column.key: getattr(user, column.key) for column in inspect(Users).column_attrs}
+    copy = Users(**columns)
+    make_transient_to_detached(copy)
+    return copy
 
 # Signup
 @router.post("/signup", response_model=UserOut)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(Users).filter(Users.username == user.username).first()
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Users).filter(Users.username == user.username))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    hashed_pw = bcrypt_context.hash(user.password)
+    hashed_pw = await hash_password(user.password)
     new_user = Users(username=user.username, email=user.email, hashed_password=hashed_pw)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    search_index.add(new_user)
     return new_user
 
+# Bulk import from a CSV (text/csv, with header) or NDJSON body
+@router.post("/users/import", response_model=ImportResult,
+             dependencies=[Depends(require_permissions(Permission.IMPORT_USERS))])
+async def bulk_import(request: Request, db: AsyncSession = Depends(get_db)):
+    csv_format = "csv" in request.headers.get("content-type", "")
+    return await import_users(db, await request.body(), csv_format)
+
 # Login
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(Users).filter(Users.username == form_data.username).first()
-    if not user or not bcrypt_context.verify(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Users).filter(Users.username == form_data.username))
+    user = result.scalars().first()
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
+    verified, new_hash = await verify_password(form_data.password, user.hashed_password)
+    if not verified:
+        raise HTTPException(status_code=400, detail="Invalid username or password")
+
+    # Transparently upgrade hashes made with an outdated cost factor
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # The role id lets permission checks skip the database entirely
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "role": user.role_id},
         expires_delta=access_token_expires
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Get current user from token
-def get_current_user(token: str = Depends(oauth2_bearer), db: Session = Depends(get_db)) -> Users:
+async def get_current_user(token: str = Depends(oauth2_bearer), db: AsyncSession = Depends(get_read_db)) -> Users:
+    from jose import JWTError
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
@@ -93,25 +126,60 @@ def get_current_user(token: str = Depends(oauth2_bearer), db: Session = Depends(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
 
-    user = db.query(Users).filter(Users.username == username).first()
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(Users).filter(Users.username == username))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
+    user = _detached_copy(user)
+    principal_cache.set(username, user)
     return user
 
 # Get current user endpoin
 @router.get("/users/me", response_model=UserOut)
-def read_users_me(current_user: Users = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+    request: Request,
+    current_user: Users = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    async def render():
+        # current_user may come from the principal cache, older than the version this body is cached under
+        result = await db.execute(select(Users).filter(Users.id == current_user.id))
+        user = result.scalars().first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return FastJSONResponse(UserOut.model_validate(user).model_dump(mode="json"))
+    return await conditional_get(request, db, Users.__tablename__, render, scope=current_user.username)
+
+# Principal cache counters
+@router.get("/cache/stats", dependencies=[Depends(require_permissions(Permission.VIEW_METRICS))])
+async def read_cache_stats():
+    return {"tokens": token_cache.stats(), "principals": principal_cache.stats()}
 
 # Get all users endpoin
 @router.get("/users", response_model=list[UserOut])
-def read_users(db: Session = Depends(get_db)):
-    users = db.query(Users).all()
-    return users
+async def read_users(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if format == "ndjson":
+        return stream_ndjson(db, select(Users), Users.id, cursor, UserOut)
+
+    async def render():
+        users = await paginate(db, select(Users), Users.id, cursor, limit, response)
+        return json_response(users, UserOut, response)
+    return await conditional_get(request, db, Users.__tablename__, render)
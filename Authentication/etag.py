@@ -0,0 +1,117 @@
+import hashlib
+import os
+import random
+import re
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models import TableVersion
+
+# Serialized bodies by (path, query, principal, version)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+# Headers worth replaying from a cached response
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+# Each table's version is spread over this many rows so writers rarely wait on each other
+VERSION_SHARDS = int(os.getenv('VERSION_SHARDS', '16'))
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _bump(session: Session, tables) -> None:
+    connection = session.connection()
+    upsert = _UPSERTS.get(connection.dialect.name, postgresql.insert)
+    versions = TableVersion.__table__
+    for table_name in tables:
+        # One statement, so concurrent first writes cannot collide on the key
+        statement = upsert(versions).values(table_name=table_name, shard=random.randrange(VERSION_SHARDS), version=1)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[versions.c.table_name, versions.c.shard],
+            set_={"version": versions.c.version + 1},
+        ))
+
+
+# Version bumps ride in the writing transaction, so every worker sees them on commit
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    tables = {
+        instance.__table__.name
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if getattr(instance, "__table__", None) is not None and instance.__table__.name != TableVersion.__tablename__
+    }
+    if tables:
+        _bump(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_writes(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name != TableVersion.__tablename__:
+            _bump(orm_execute_state.session, {mapper.local_table.name})
+
+
+# One entity tag of an If-None-Match list: optional W/ prefix plus the quoted opaque tag
+_ENTITY_TAG = re.compile(r'\s*(?:W/)?("[^"]*")\s*(?:,|$)')
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison (RFC 9110 13.1.2) of etag against an If-None-Match value"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(match.group(1) == opaque for match in _ENTITY_TAG.finditer(if_none_match))
+
+
+async def table_version(db: AsyncSession, table_name: str) -> int:
+    result = await db.execute(select(func.sum(TableVersion.version)).where(TableVersion.table_name == table_name))
+    return result.scalar() or 0
+
+
+async def conditional_get(
+    request: Request,
+    db: AsyncSession,
+    table_name: str,
+    render: Callable[[], Awaitable[Response]],
+    scope: str = "",
+) -> Response:
+    """
+    Serve a GET from the body cache keyed by the table version.
+
+    render builds the full response (see serialization.json_response); it is
+    only awaited on a cache miss.
+
+    Answers 304 when If-None-Match already holds the current ETag; otherwise
+    renders (and caches) the body only when the table changed since last time.
+    """
+    version = await table_version(db, table_name)
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())), scope, version)
+    etag = 'W/"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(key)
+    if cached is None:
+        rendered = await render()
+        cached = (
+            rendered.body,
+            rendered.status_code,
+            {name: value for name, value in rendered.headers.items() if name in CACHED_HEADERS},
+        )
+        if rendered.status_code == 200:
+            response_cache.set(key, cached)
+
+    body, status_code, cached_headers = cached
+    return Response(content=body, status_code=status_code, headers={**cached_headers, **headers})
@@ -0,0 +1,63 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+# Hashing settings
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', str(HASH_WORKERS * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv('HASH_QUEUE_TIMEOUT', '2'))
+
+
+@lru_cache(maxsize=None)
+def bcrypt_context():
+    # passlib/bcrypt are imported on first use to keep worker start-up fast
+    from passlib.context import CryptContext
+
+    # Hashes made with a different cost factor are reported by needs_update
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# bcrypt releases the GIL, so a thread pool gives real parallelism
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = asyncio.Semaphore(HASH_MAX_PENDING)
+
+
+async def _run(func, *args, timeout: Optional[float] = HASH_QUEUE_TIMEOUT):
+    # Backpressure: shed load instead of queueing hashes without bound
+    try:
+        await asyncio.wait_for(_pending.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+    finally:
+        _pending.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run(bcrypt_context().hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a replacement hash when the stored one is outdated."""
+    return await _run(bcrypt_context().verify_and_update, password, hashed_password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords in parallel, waiting for pool slots instead of shedding."""
+    hashed: List[str] = []
+    # At most HASH_WORKERS in flight so interactive logins still get slots
+    for start in range(0, len(passwords), HASH_WORKERS):
+        window = passwords[start:start + HASH_WORKERS]
+        hashed.extend(await asyncio.gather(*(_run(bcrypt_context().hash, p, timeout=None) for p in window)))
+    return hashed
@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import os
+from typing import Iterator, List, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from hashing import hash_passwords
+from models import Users
+from search import search_index
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+
+
+class ImportRow(BaseModel):
+    username: str
+    email: str
+    password: str
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+def parse_rows(body: bytes, csv_format: bool) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, raw record) from a CSV (with header) or NDJSON body."""
+    try:
+        text = io.StringIO(body.decode("utf-8-sig"))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Import body must be UTF-8")
+    if csv_format:
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, record
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+async def import_users(db: AsyncSession, body: bytes, csv_format: bool) -> ImportResult:
+    result = ImportResult()
+    batch: List[Tuple[int, ImportRow]] = []
+
+    def fail(number: int, error: str) -> None:
+        result.failed += 1
+        result.errors.append(ImportRowError(row=number, error=error))
+
+    for number, record in parse_rows(body, csv_format):
+        if not isinstance(record, dict):
+            fail(number, "Malformed record")
+            continue
+        if None in record:
+            # csv.DictReader files surplus fields under a None key
+            fail(number, "More fields than the header")
+            continue
+        try:
+            batch.append((number, ImportRow(**record)))
+        except ValidationError as exc:
+            fail(number, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()))
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _import_batch(db, batch, result, fail)
+            batch = []
+    if batch:
+        await _import_batch(db, batch, result, fail)
+    result.errors.sort(key=lambda error: error.row)
+    return result
+
+
+async def _import_batch(db: AsyncSession, batch, result: ImportResult, fail) -> None:
+    # One uniqueness query for the whole batch
+    usernames = [row.username for _, row in batch]
+    emails = [row.email for _, row in batch]
+    existing = await db.execute(
+        select(Users.username, Users.email).filter(or_(Users.username.in_(usernames), Users.email.in_(emails)))
+    )
+    taken_usernames, taken_emails = set(), set()
+    for username, email in existing:
+        taken_usernames.add(username)
+        taken_emails.add(email)
+
+    accepted: List[Tuple[int, ImportRow]] = []
+    for number, row in batch:
+        if row.username in taken_usernames:
+            fail(number, "Username already exists")
+        elif row.email in taken_emails:
+            fail(number, "Email already exists")
+        else:
+            # Also rejects duplicates within the upload itself
+            taken_usernames.add(row.username)
+            taken_emails.add(row.email)
+            accepted.append((number, row))
+    if not accepted:
+        return
+
+    hashed = await hash_passwords([row.password for _, row in accepted])
+    values = [
+        {"username": row.username, "email": row.email, "hashed_password": hashed_pw}
+        for (_, row), hashed_pw in zip(accepted, hashed)
+    ]
+    statement = insert(Users).returning(Users.id, Users.username, Users.email)
+    try:
+        # Sent as multi-row INSERT statements by the driver
+        inserted = await db.execute(statement, values)
+        rows = inserted.all()
+        await db.commit()
+    except IntegrityError:
+        # A concurrent writer took one of the names; retry row by row, each in
+        # its own SAVEPOINT, so only the conflicting rows fail
+        await db.rollback()
+        rows = []
+        for (number, _), value in zip(accepted, values):
+            try:
+                async with db.begin_nested():
+                    inserted = await db.execute(statement.values(value))
+                rows.append(inserted.one())
+            except IntegrityError:
+                fail(number, "Conflicts with a concurrently created user")
+        await db.commit()
+
+    result.imported += len(rows)
+    search_index.add_many(rows)
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Instrumentation settings
+SQL_STRICT_MODE = os.getenv('SQL_STRICT_MODE', 'false').lower() in ('1', 'true', 'yes')
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '3'))
+SLOWEST_STATEMENTS = int(os.getenv('SLOWEST_STATEMENTS', '5'))
+
+
+class NPlusOneError(RuntimeError):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.statements: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.query_count += 1
+        self.db_seconds += elapsed
+        self.statements.append((elapsed, statement))
+
+    def slowest(self, limit: int = SLOWEST_STATEMENTS) -> List[Tuple[float, str]]:
+        return sorted(self.statements, reverse=True)[:limit]
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """Identical statements issued at least threshold times: the N+1 signature"""
+        counts = Counter(statement for _, statement in self.statements)
+        return {statement: count for statement, count in counts.items() if count >= threshold}
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+
+# The start time lives on the execution context rather than a per-connection
+# stack: a statement that raises never reaches after_cursor_execute, and a
+# stack entry left behind would pair every later timing with the wrong start
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def instrument(engine: Engine) -> None:
+    """Record every statement run on engine against the current request"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class EndpointMetrics:
+    """Per-endpoint totals plus the slowest statements seen"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, dict] = {}
+
+    def add(self, endpoint: str, stats: RequestStats, total_seconds: float) -> None:
+        with self._lock:
+            metrics = self._endpoints.setdefault(endpoint, {
+                "requests": 0, "queries": 0, "db_ms": 0.0, "total_ms": 0.0,
+                "max_queries": 0, "slowest": [],
+            })
+            metrics["requests"] += 1
+            metrics["queries"] += stats.query_count
+            metrics["db_ms"] += stats.db_seconds * 1000
+            metrics["total_ms"] += total_seconds * 1000
+            metrics["max_queries"] = max(metrics["max_queries"], stats.query_count)
+            slowest = metrics["slowest"] + [
+                {"ms": elapsed * 1000, "statement": statement} for elapsed, statement in stats.slowest()
+            ]
+            metrics["slowest"] = sorted(slowest, key=lambda s: s["ms"], reverse=True)[:SLOWEST_STATEMENTS]
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                endpoint: {
+                    **metrics,
+                    "avg_queries": metrics["queries"] / metrics["requests"],
+                    "avg_db_ms": metrics["db_ms"] / metrics["requests"],
+                    "slowest": list(metrics["slowest"]),
+                }
+                for endpoint, metrics in self._endpoints.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+async def sql_metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = _current.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    total = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    endpoint = f"{request.method} {route.path if route else request.url.path}"
+    endpoint_metrics.add(endpoint, stats, total)
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.query_count} queries", '
+        f'app;dur={total * 1000:.2f}'
+    )
+
+    if SQL_STRICT_MODE:
+        repeated = stats.repeated()
+        if repeated:
+            raise NPlusOneError(f"{endpoint} repeated statements: {repeated}")
+    return response
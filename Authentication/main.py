@@ -1,22 +1,41 @@
-from fastapi import FastAPI, status, HTTPException, Depends, Query
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
 from typing import List,  Optional
 import models
-from database import engine, SessionLocal
-from sqlalchemy.orm import Session
+from database import create_schema, dispose_engines, get_async_engine, get_db, get_read_db
+from instrumentation import endpoint_metrics, instrument, sql_metrics_middleware
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, stream_ndjson
+from search import search_index, search_users
+from serialization import json_response
+from etag import conditional_get, response_cache
+from permissions import Permission, require_permissions, role_cache, token_permissions
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
 import auth 
 
+# Schema is managed by `python migrate.py`; this is for local SQLite/dev setups only
+CREATE_SCHEMA_ON_STARTUP = os.getenv('CREATE_SCHEMA_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
 
-app = FastAPI()
-models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_async_engine()
+    if CREATE_SCHEMA_ON_STARTUP:
+        await create_schema()
+    await role_cache.load()
+    yield
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Per-request SQL metrics, for every engine as it gets created
+instrument(Engine)
+app.middleware("http")(sql_metrics_middleware)
 
 #db_dependency = Annotated(Session, Depends(get_db))
 
@@ -39,20 +58,22 @@ class user(BaseModel):
     id: int
     username: str
     email: str
-    full_name: str
+    full_name: Optional[str] = None
     is_active: bool = True
 
 
 @app.post("/login", response_model=user)
-def login(user_login: userlogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.Users).filter(models.Users.username == user_login.username).first()
+async def login(user_login: userlogin, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(models.Users).filter(models.Users.username == user_login.username))
+    db_user = result.scalars().first()
     if not db_user or db_user.hashed_password != user_login.password:
         raise HTTPException(status_code=400, detail="Invalid username or password")
     return db_user
 
 @app.post("/signup", response_model=user)
-def signup(user_signup: usersignup, db: Session = Depends(get_db)):
-    db_user = db.query(models.Users).filter(models.Users.username == user_signup.username).first()
+async def signup(user_signup: usersignup, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(models.Users).filter(models.Users.username == user_signup.username))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Username already exists")
     
@@ -64,14 +85,16 @@ def signup(user_signup: usersignup, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    search_index.add(new_user)
     
     return new_user
 
 @app.post("/profile", response_model=userprofile)
-def create_profile(profile: userprofile, db: Session = Depends(get_db)):
-    db_user = db.query(models.Users).filter(models.Users.id == profile.user_id).first()
+async def create_profile(profile: userprofile, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(models.Users).filter(models.Users.id == profile.user_id))
+    db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -83,20 +106,50 @@ def create_profile(profile: userprofile, db: Session = Depends(get_db)):
     )
 
     db.add(new_profile)
-    db.commit()
-    db.refresh(new_profile)
+    await db.commit()
+    await db.refresh(new_profile)
 
     return new_profile
 
 @app.get("/users", response_model=List[user])
-def get_users(
-    name: Optional[str] = Query(None, description="Search by username"),
-    db: Session = Depends(get_db)
+async def get_users(
+    request: Request,
+    response: Response,
+    name: Optional[str] = Query(None, description="Search by username or email; returns the top `limit` ranked matches, unpaged (no cursor or ndjson)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    if name:
-        users = db.query(models.Users).filter(models.Users.username.ilike(f"%{name}%")).all()
-    else:
-        users = db.query(models.Users).all()
-    return users
-
-
+    # Search results are ranked, not keyed by id, so they cannot be paged or streamed
+    if name and (cursor or format == "ndjson"):
+        raise HTTPException(status_code=400, detail="name cannot be combined with cursor or format=ndjson")
+
+    query = select(models.Users)
+    if format == "ndjson":
+        return stream_ndjson(db, query, models.Users.id, cursor, user)
+
+    async def render():
+        if name:
+            users = await search_users(db, name, limit)
+        else:
+            users = await paginate(db, query, models.Users.id, cursor, limit, response)
+        return json_response(users, user, response)
+    return await conditional_get(request, db, models.Users.__tablename__, render)
+
+@app.get("/permissions")
+async def get_permissions(granted: Permission = Depends(token_permissions)):
+    return {"permissions": [permission.name for permission in Permission if permission & granted]}
+
+# Exposes SQL text and cache internals, so operators only
+@app.get("/debug/metrics", dependencies=[Depends(require_permissions(Permission.VIEW_METRICS))])
+async def debug_metrics():
+    return {
+        "endpoints": endpoint_metrics.snapshot(),
+        "caches": {
+            "tokens": auth.token_cache.stats(),
+            "principals": auth.principal_cache.stats(),
+            "responses": response_cache.stats(),
+            "roles": role_cache.stats(),
+        },
+    }
@@ -0,0 +1,39 @@
+"""
+Create the Authentication schema.
+
+Run once per deploy, before starting workers:
+
+    python migrate.py
+"""
+from sqlalchemy import text
+
+import models
+from database import Base, get_engine
+
+# create_all skips indexes on tables that already exist, so the trigram
+# indexes behind user search are (re)applied here; CONCURRENTLY keeps
+# users writable while they build
+TRGM_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+]
+
+
+def create_search_indexes(engine) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in TRGM_STATEMENTS:
+            conn.execute(text(statement))
+
+
+def main():
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    create_search_indexes(engine)
+
+
+if __name__ == "__main__":
+    main()
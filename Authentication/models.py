@@ -1,6 +1,20 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DDL, ForeignKey, Index, event
 from database import Base
 
+# Trigram indexes below need the pg_trgm extension
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+class Roles(Base):
+    """Same table as the main app's Role model; role holds a RoleName value"""
+    __tablename__ = "role"
+
+    id = Column(Integer, primary_key=True)
+    role = Column(String, nullable=True)
+
 class Users(Base):
     __tablename__ = "users"
 
@@ -9,6 +23,15 @@ class Users(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    role_id = Column(Integer, ForeignKey("role.id"), nullable=True)
+
+    __table_args__ = (
+        # Substring search (ILIKE '%term%') on Postgres
+        Index("ix_users_username_trgm", "username", postgresql_using="gin",
+              postgresql_ops={"username": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
@@ -21,3 +44,12 @@ class UserProfile(Base):
 
     # Foreign key relationship can be defined if needed
     # user = relationship("Users", back_populates="profile")
+
+class TableVersion(Base):
+    """Bumped in the same transaction as every write to table_name; drives ETags"""
+    __tablename__ = "table_versions"
+
+    # A table's version is the sum over its shards
+    table_name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    version = Column(Integer, nullable=False, default=0)
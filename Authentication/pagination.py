@@ -0,0 +1,84 @@
+import base64
+import json
+import os
+from typing import Optional, Type
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, failover
+from serialization import dumps, serializer_for
+
+# Pagination settings
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '1000'))
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '1000'))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query, id_column, cursor: Optional[str]):
+    """Order a select by id and start it after the position encoded in cursor."""
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    return query.order_by(id_column)
+
+
+async def paginate(db: AsyncSession, query, id_column, cursor: Optional[str], limit: int, response: Response) -> list:
+    """Fetch one page; the cursor for the next page is returned in a response header."""
+    result = await db.execute(keyset(query, id_column, cursor).limit(limit + 1))
+    rows = result.scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return rows
+
+
+def stream_ndjson(db: AsyncSession, query, id_column, cursor: Optional[str], schema: Type[BaseModel]) -> StreamingResponse:
+    """
+    Stream every matching row as NDJSON through a server-side cursor on db's engine.
+
+    If a replica fails, the stream resumes on the primary after the last row
+    sent, so the client gets neither a truncated body nor duplicates.
+    """
+    after_id = decode_cursor(cursor)
+    serialize = serializer_for(schema)
+
+    async def generate():
+        bind, last_id = db.bind, after_id
+        while True:
+            query_after = query.filter(id_column > last_id) if last_id is not None else query
+            try:
+                # The request session may be closed before the body is sent, so use our own
+                async with AsyncSessionLocal(bind=bind) as stream_db:
+                    rows = await stream_db.stream_scalars(
+                        query_after.order_by(id_column).execution_options(yield_per=STREAM_CHUNK_SIZE)
+                    )
+                    async for chunk in rows.partitions():
+                        body = b"".join(dumps(serialize(row)) + b"\n" for row in chunk)
+                        last_id = getattr(chunk[-1], id_column.key)
+                        yield body
+                return
+            except (OperationalError, InterfaceError):
+                bind = failover(bind)
+                if bind is None:
+                    raise
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
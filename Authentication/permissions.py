@@ -0,0 +1,120 @@
+import logging
+import os
+import time
+from enum import Enum, IntFlag
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, select
+
+from tokens import decode_token, oauth2_bearer
+from database import async_session
+from models import Roles
+
+# Upper bound on how long another worker's role edits can go unnoticed
+ROLE_CACHE_TTL = float(os.getenv('ROLE_CACHE_TTL', '300'))
+
+logger = logging.getLogger(__name__)
+
+
+# Copy of RoleName in the main app's Role.py (this service cannot import app.*).
+# Keep the two in sync: a role row whose name is missing here gets Permission.NONE.
+class RoleName(str, Enum):
+    EMPLOYEE = "EMPLOYEE"
+    ADMIN = "ADMIN"
+    SUPER_ADMIN = "SUPER_ADMIN"
+
+
+class Permission(IntFlag):
+    NONE = 0
+    READ_SELF = 1 << 0
+    READ_USERS = 1 << 1
+    MANAGE_USERS = 1 << 2
+    IMPORT_USERS = 1 << 3
+    MANAGE_ROLES = 1 << 4
+    VIEW_METRICS = 1 << 5
+
+
+ROLE_PERMISSIONS: Mapping[RoleName, Permission] = MappingProxyType({
+    RoleName.EMPLOYEE: Permission.READ_SELF,
+    RoleName.ADMIN: Permission.READ_SELF | Permission.READ_USERS | Permission.MANAGE_USERS
+    | Permission.IMPORT_USERS | Permission.VIEW_METRICS,
+    RoleName.SUPER_ADMIN: Permission(sum(Permission)),
+})
+
+
+class RoleCache:
+    """Role id -> permission bitmask, loaded from the role table and swapped in whole"""
+
+    def __init__(self, ttl: float = ROLE_CACHE_TTL):
+        self.ttl = ttl
+        self._masks: Optional[Mapping[int, Permission]] = None
+        self._loaded_at = 0.0
+        self.loads = 0
+
+    async def load(self) -> Mapping[int, Permission]:
+        async with async_session() as db:
+            result = await db.execute(select(Roles.id, Roles.role))
+            masks = {}
+            for role_id, name in result.all():
+                try:
+                    masks[role_id] = ROLE_PERMISSIONS[RoleName(name)]
+                except ValueError:
+                    logger.warning("role %s has unknown name %r; granting no permissions", role_id, name)
+                    masks[role_id] = Permission.NONE
+        self._masks = MappingProxyType(masks)
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+        return self._masks
+
+    async def masks(self) -> Mapping[int, Permission]:
+        # Loaded at startup; only reloads after a role change or the TTL
+        masks = self._masks
+        if masks is None or time.monotonic() - self._loaded_at > self.ttl:
+            masks = await self.load()
+        return masks
+
+    def invalidate(self) -> None:
+        self._masks = None
+
+    def stats(self) -> dict:
+        return {"roles": len(self._masks or {}), "loads": self.loads}
+
+
+role_cache = RoleCache()
+
+
+# Role rows edited in this process take effect on the next check
+@event.listens_for(Roles, "after_insert")
+@event.listens_for(Roles, "after_update")
+@event.listens_for(Roles, "after_delete")
+def _invalidate_roles(mapper, connection, target):
+    role_cache.invalidate()
+
+
+async def token_permissions(token: str = Depends(oauth2_bearer)) -> Permission:
+    """Permissions of the bearer token's role, without touching the users table"""
+    from jose import JWTError
+
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    role_id = payload.get("role")
+    if role_id is None:
+        return Permission.NONE
+    return (await role_cache.masks()).get(role_id, Permission.NONE)
+
+
+def require_permissions(required: Permission):
+    """Dependency that 403s unless the token's role grants every bit of required"""
+    async def check(granted: Permission = Depends(token_permissions)) -> Permission:
+        if granted & required != required:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        return granted
+    return check
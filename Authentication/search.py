@@ -0,0 +1,142 @@
+import asyncio
+import bisect
+import heapq
+import os
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import ASYNC_URL_DATABASE
+from models import Users
+
+# "sql" uses pg_trgm indexes, "memory" keeps an in-process index (SQLite/test deployments)
+SEARCH_BACKEND = os.getenv('USER_SEARCH_BACKEND', 'memory' if ASYNC_URL_DATABASE.startswith('sqlite') else 'sql')
+
+NGRAM = 3
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _ngrams(value: str) -> Set[str]:
+    return {value[i:i + NGRAM] for i in range(len(value) - NGRAM + 1)}
+
+
+def _index_keys(value: str) -> Set[str]:
+    # Shorter grams too, so one- and two-character terms are a single lookup
+    return {value[i:i + n] for n in range(1, NGRAM + 1) for i in range(len(value) - n + 1)}
+
+
+class UserSearchIndex:
+    """Sorted username prefix array plus an n-gram map (up to trigrams) for substring matches."""
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = asyncio.Lock()
+        self._users: Dict[int, Tuple[str, str]] = {}
+        self._prefixes: List[Tuple[str, int]] = []
+        self._grams: Dict[str, Set[int]] = {}
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self.loaded:
+            return
+        async with self._lock:
+            if self.loaded:
+                return
+            result = await db.execute(select(Users.id, Users.username, Users.email))
+            for user_id, username, email in result:
+                self._add(user_id, username, email)
+            self.loaded = True
+
+    def add(self, user: Users) -> None:
+        # Before the first load the rows will be picked up from the table anyway
+        if self.loaded:
+            self.remove(user.id)
+            self._add(user.id, user.username, user.email)
+
+    def add_many(self, rows) -> None:
+        if self.loaded:
+            for user_id, username, email in rows:
+                self.remove(user_id)
+                self._add(user_id, username, email)
+
+    def _add(self, user_id: int, username: str, email: str) -> None:
+        username, email = username.lower(), email.lower()
+        self._users[user_id] = (username, email)
+        bisect.insort(self._prefixes, (username, user_id))
+        for gram in _index_keys(username) | _index_keys(email):
+            self._grams.setdefault(gram, set()).add(user_id)
+
+    def remove(self, user_id: int) -> None:
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+        username, email = entry
+        self._prefixes.remove((username, user_id))
+        for gram in _index_keys(username) | _index_keys(email):
+            self._grams[gram].discard(user_id)
+
+    def search(self, term: str, limit: int) -> List[int]:
+        """Return matching ids, username prefix matches first."""
+        term = term.lower()
+        ranked: List[int] = []
+
+        index = bisect.bisect_left(self._prefixes, (term, -1))
+        while index < len(self._prefixes) and len(ranked) < limit:
+            username, user_id = self._prefixes[index]
+            if not username.startswith(term):
+                break
+            ranked.append(user_id)
+            index += 1
+        if len(ranked) >= limit:
+            return ranked
+
+        if len(term) > NGRAM:
+            postings = [self._grams.get(gram, set()) for gram in _ngrams(term)]
+            candidates = set.intersection(*sorted(postings, key=len))
+        else:
+            candidates = self._grams.get(term, set())
+
+        seen = set(ranked)
+        matches = (
+            user_id for user_id in candidates
+            if user_id not in seen and (term in self._users[user_id][0] or term in self._users[user_id][1])
+        )
+        # Lowest ids first without sorting every candidate
+        ranked.extend(heapq.nsmallest(limit - len(ranked), matches))
+        return ranked
+
+
+search_index = UserSearchIndex()
+
+
+async def search_users(db: AsyncSession, term: str, limit: int) -> List[Users]:
+    """Top `limit` users whose username or email contains term, prefix matches first."""
+    if SEARCH_BACKEND == 'memory':
+        await search_index.ensure_loaded(db)
+        ids = search_index.search(term, limit)
+        if not ids:
+            return []
+        result = await db.execute(select(Users).filter(Users.id.in_(ids)))
+        by_id = {user.id: user for user in result.scalars()}
+        return [by_id[user_id] for user_id in ids if user_id in by_id]
+
+    # Served by the pg_trgm GIN indexes declared on Users
+    pattern = _escape_like(term)
+    query = (
+        select(Users)
+        .filter(or_(
+            Users.username.ilike(f"%{pattern}%", escape="\\"),
+            Users.email.ilike(f"%{pattern}%", escape="\\"),
+        ))
+        .order_by(
+            case((Users.username.ilike(f"{pattern}%", escape="\\"), 0), else_=1),
+            func.similarity(Users.username, term).desc(),
+            Users.id,
+        )
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return result.scalars().all()
@@ -0,0 +1,101 @@
+import json
+import os
+import typing
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Opt-in: bypass response_model validation for trusted ORM/DTO data
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+def _field_converter(annotation) -> Optional[Callable[[Any], Any]]:
+    """How to turn one attribute into JSON-ready data, or None to pass it through"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        converters = [_field_converter(arg) for arg in args if arg is not type(None)]
+        convert = converters[0] if len(converters) == 1 else None
+        return (lambda value: None if value is None else convert(value)) if convert else None
+    if origin in (list, set, frozenset, tuple, typing.List, typing.Set) and args:
+        item = _field_converter(args[0])
+        if item:
+            return lambda values: [item(value) for value in values] if values is not None else None
+        return lambda values: list(values) if values is not None else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return serializer_for(annotation)
+    return None
+
+
+@lru_cache(maxsize=None)
+def serializer_for(schema: Type[BaseModel]) -> Callable[[Any], dict]:
+    """
+    Precompile a serializer for a response schema.
+
+    Reads the schema's fields straight off ORM rows or DTO instances without
+    revalidating them; nested schemas and collections get their own compiled
+    serializers. Only use it for data the app itself produced.
+    """
+    fields = []
+    for name, field in schema.model_fields.items():
+        fields.append((field.serialization_alias or name, name, field.default, _field_converter(field.annotation)))
+
+    def serialize(obj: Any) -> dict:
+        data = {}
+        for key, attribute, default, convert in fields:
+            value = getattr(obj, attribute, default)
+            data[key] = convert(value) if convert and value is not None else value
+        return data
+
+    return serialize
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(rows: Iterable[Any], schema: Type[BaseModel], response: Optional[Response] = None) -> FastJSONResponse:
+    """Serialize rows with the compiled serializer, keeping headers already set on response"""
+    serialize = serializer_for(schema)
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse([serialize(row) for row in rows], headers=headers)
+
+
+def json_response(rows: Iterable[Any], schema: Type[BaseModel], response: Optional[Response] = None) -> Response:
+    """Render rows to a concrete response, validating them unless FAST_SERIALIZATION is on"""
+    if FAST_SERIALIZATION:
+        return fast_response(rows, schema, response)
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse([schema.model_validate(row, from_attributes=True).model_dump(mode="json") for row in rows], headers=headers)
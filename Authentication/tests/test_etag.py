@@ -0,0 +1,77 @@
+"""Conditional GETs: If-None-Match parsing and /auth/users/me freshness"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import auth
+import database
+from database import Base, async_session
+from etag import etag_matches, response_cache
+from models import Users
+from tokens import create_access_token
+
+ETAG = 'W/"abc"'
+
+
+@pytest.mark.parametrize("header", ['W/"abc"', '"abc"', '"x", W/"abc"', ' "x" ,W/"abc" ', "*"])
+def test_etag_matches(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", ["", 'W/"ab"', '"abcd"', 'W/"xabc"', "abc", '"x", "y"'])
+def test_etag_does_not_match(header):
+    assert not etag_matches(header, ETAG)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "ASYNC_URL_DATABASE", f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}")
+    monkeypatch.setattr(database, "REPLICA_DATABASE_URLS", [])
+    monkeypatch.setattr(database, "_engines", {})
+    response_cache.clear()
+    auth.principal_cache.clear()
+
+    async def seed():
+        async with database.get_async_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(Users.__table__.insert().values(id=1, username="alice", email="a@example.com",
+                                                               hashed_password="x"))
+    asyncio.run(seed())
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    with TestClient(app) as client:
+        client.headers["Authorization"] = "Bearer " + create_access_token({"sub": "alice"}, timedelta(minutes=5))
+        yield client
+    asyncio.run(database.dispose_engines())
+
+
+def change_email(email):
+    async def run():
+        # A bulk UPDATE bumps the table version but skips the principal cache listener
+        async with async_session() as db:
+            await db.execute(update(Users).where(Users.id == 1).values(email=email))
+            await db.commit()
+    asyncio.run(run())
+
+
+def test_unchanged_user_answers_304(client):
+    first = client.get("/auth/users/me")
+    assert first.status_code == 200
+    again = client.get("/auth/users/me", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_me_is_rendered_from_the_current_row(client):
+    first = client.get("/auth/users/me")
+    assert first.json()["email"] == "a@example.com"
+
+    change_email("new@example.com")
+    fresh = client.get("/auth/users/me", headers={"If-None-Match": first.headers["etag"]})
+    assert fresh.status_code == 200
+    assert fresh.json()["email"] == "new@example.com"
+    assert fresh.headers["etag"] != first.headers["etag"]
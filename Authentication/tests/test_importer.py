@@ -0,0 +1,49 @@
+"""Bulk user import when a concurrent writer takes a name mid-batch"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import importer
+from database import Base
+from importer import import_users
+from models import Users
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    asyncio.run(create())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+def test_concurrent_conflict_fails_only_that_row(engine, monkeypatch):
+    async def hash_passwords(passwords):
+        # Between the uniqueness check and the INSERT another writer creates "bob"
+        async with engine.begin() as conn:
+            await conn.execute(Users.__table__.insert().values(username="bob", email="bob@other.com",
+                                                               hashed_password="x"))
+        return [f"hashed-{password}" for password in passwords]
+    monkeypatch.setattr(importer, "hash_passwords", hash_passwords)
+    body = b"".join(
+        b'{"username": "%s", "email": "%s@example.com", "password": "pw"}\n' % (name, name)
+        for name in (b"alice", b"bob", b"carol")
+    )
+
+    async def run():
+        async with AsyncSession(engine) as db:
+            result = await import_users(db, body, csv_format=False)
+            usernames = (await db.execute(select(Users.username).order_by(Users.username))).scalars().all()
+        return result, usernames
+
+    result, usernames = asyncio.run(run())
+
+    assert result.imported == 2
+    assert [(error.row, error.error) for error in result.errors] == [(2, "Conflicts with a concurrently created user")]
+    assert usernames == ["alice", "bob", "carol"]
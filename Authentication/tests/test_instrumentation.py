@@ -0,0 +1,35 @@
+"""Statement timings recorded by instrument(), including around failed statements"""
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import instrumentation
+from instrumentation import RequestStats, instrument
+
+
+@pytest.fixture
+def stats():
+    stats = RequestStats()
+    token = instrumentation._current.set(stats)
+    yield stats
+    instrumentation._current.reset(token)
+
+
+def test_failed_statements_leave_nothing_behind(stats, monkeypatch):
+    engine = create_engine("sqlite://")
+    instrument(engine)
+    clock = iter([0.0, 10.0, 100.0, 101.0])
+    monkeypatch.setattr(time, "perf_counter", lambda: next(clock))
+
+    with engine.connect() as conn:
+        for _ in range(2):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+        # No per-connection state outlives the statements that created it
+        assert not conn.info.get("query_start")
+
+    # Only the successful statement is recorded, timed from its own start
+    assert stats.statements == [(1.0, "SELECT 1")]
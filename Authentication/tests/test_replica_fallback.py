@@ -0,0 +1,116 @@
+"""get_read_db and the NDJSON stream against a primary and a replica SQLite file"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import database
+import pagination
+from database import Base, ReplicaRouter, get_read_db
+from models import Users
+from pagination import stream_ndjson
+
+
+class Row(BaseModel):
+    id: int
+    username: str
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    monkeypatch.setattr(database, "ASYNC_URL_DATABASE", primary_url)
+    monkeypatch.setattr(database, "REPLICA_DATABASE_URLS", [replica_url])
+    monkeypatch.setattr(database, "replica_router", ReplicaRouter([replica_url]))
+    monkeypatch.setattr(database, "_engines", {})
+    asyncio.run(_seed(primary_url, "on-primary"))
+    yield replica_url
+    asyncio.run(database.dispose_engines())
+
+
+async def _seed(url, *usernames):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(Users.__table__.insert(), [
+            {"username": username, "email": f"{username}@example.com", "hashed_password": "x"}
+            for username in usernames
+        ])
+    await engine.dispose()
+
+
+def with_read_db(use, cookies=None):
+    async def run():
+        dependency = get_read_db(SimpleNamespace(cookies=cookies or {}))
+        db = await dependency.__anext__()
+        try:
+            return await use(db)
+        finally:
+            await dependency.aclose()
+    return asyncio.run(run())
+
+
+def read_usernames(cookies=None):
+    async def use(db):
+        result = await db.execute(select(Users.username))
+        return [username for username, in result]
+    return with_read_db(use, cookies)
+
+
+def stream_usernames():
+    async def use(db):
+        response = stream_ndjson(db, select(Users), Users.id, None, Row)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return [json.loads(line)["username"] for line in body.splitlines()]
+    return with_read_db(use)
+
+
+def test_reads_go_to_a_healthy_replica(databases):
+    asyncio.run(_seed(databases, "on-replica"))
+    assert read_usernames() == ["on-replica"]
+
+
+def test_failing_replica_falls_back_to_the_primary_within_the_request(databases):
+    # The replica file exists but has no schema, so the query fails there
+    assert read_usernames() == ["on-primary"]
+    assert database.replica_router.pick() is None
+
+
+def test_pinned_client_reads_the_primary(databases):
+    asyncio.run(_seed(databases, "on-replica"))
+    pinned = {database.STICKY_PRIMARY_COOKIE: str(10 ** 12)}
+    assert read_usernames(pinned) == ["on-primary"]
+
+
+def test_stream_reads_a_healthy_replica(databases):
+    asyncio.run(_seed(databases, "on-replica"))
+    assert stream_usernames() == ["on-replica"]
+
+
+def test_stream_falls_back_when_the_replica_fails_to_open(databases):
+    assert stream_usernames() == ["on-primary"]
+    assert database.replica_router.pick() is None
+
+
+def test_stream_resumes_on_the_primary_after_the_last_row_sent(databases, monkeypatch):
+    asyncio.run(_seed(database.ASYNC_URL_DATABASE, "p2", "p3"))
+    asyncio.run(_seed(databases, "r1", "r2", "r3"))
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 1)
+
+    dumps, calls = pagination.dumps, []
+
+    def failing_once(data):
+        calls.append(data)
+        if len(calls) == 2:
+            raise OperationalError("SELECT", {}, Exception("replica connection lost"))
+        return dumps(data)
+    monkeypatch.setattr(pagination, "dumps", failing_once)
+
+    assert stream_usernames() == ["r1", "p2", "p3"]
+    assert database.replica_router.pick() is None
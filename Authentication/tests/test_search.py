@@ -0,0 +1,50 @@
+"""In-memory UserSearchIndex ranking"""
+import pytest
+
+from search import UserSearchIndex
+
+USERS = [
+    (1, "bob", "robert@example.com"),
+    (2, "alice", "alice@example.com"),
+    (3, "alicia", "ally@example.org"),
+    (4, "malice", "m@example.com"),
+    (5, "zed", "zed@alice.dev"),
+]
+
+
+@pytest.fixture
+def index():
+    index = UserSearchIndex()
+    for user_id, username, email in USERS:
+        index._add(user_id, username, email)
+    index.loaded = True
+    return index
+
+
+def test_prefix_matches_rank_before_substring_matches(index):
+    assert index.search("ali", 10) == [2, 3, 4, 5]
+
+
+def test_substring_matches_are_in_id_order_and_limited(index):
+    assert index.search("lic", 2) == [2, 3]
+    assert index.search("lice", 10) == [2, 4, 5]
+
+
+def test_short_terms_use_the_index(index):
+    assert index.search("b", 10) == [1]
+    assert index.search("o", 3) == [1, 2, 3]
+    assert index.search("ex", 10) == [1, 2, 3, 4]
+    assert index.search("q", 10) == []
+
+
+def test_search_is_case_insensitive(index):
+    assert index.search("ALICE", 10) == [2, 4, 5]
+
+
+def test_updates_and_removals_are_reflected(index):
+    index.add_many([(1, "alina", "a@example.com")])
+    assert index.search("ali", 10) == [2, 3, 1, 4, 5]
+    assert index.search("bob", 10) == []
+    index.remove(4)
+    assert index.search("lice", 10) == [2, 5]
+    assert index.search("mal", 10) == []
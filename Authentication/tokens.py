@@ -0,0 +1,44 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+from fastapi.security import OAuth2PasswordBearer
+
+from cache import TTLCache
+
+# JWT settings
+SECRET_KEY = "your_secret_key"
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# Security
+oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/login")  # matches route
+
+# Decoded tokens by token hash
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+token_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def decode_token(token: str) -> dict:
+    # jose is imported lazily to keep worker start-up fast
+    from jose import jwt, JWTError
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(key, payload, ttl=payload.get("exp", 0) - time.time())
+    elif payload.get("exp", 0) <= time.time():
+        token_cache.invalidate(key)
+        raise JWTError("Signature has expired.")
+    return payload
+
+# JWT creation function
+def create_access_token(data: dict, expires_delta: timedelta):
+    from jose import jwt
+
+    to_encode = data.copy()
+    expire = datetime.utcnow() + expires_delta
+    to_encode.update({"exp": expire})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
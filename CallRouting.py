@@ -0,0 +1,176 @@
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+from sqlmodel import Session, select
+
+from app.models.enums.active_association import ActiveAssociation
+from app.models.twilio_number import FORWARDING_CHANGES_KEY, ROUTE_REFRESH_KEY, TwilioNumber
+
+_PENDING_KEY = "call_routing_pending"
+
+
+@dataclass(frozen=True)
+class Route:
+    twilioNumberId: int
+    phoneNumber: str
+    activeAssociation: ActiveAssociation
+    actorId: Optional[int]
+    forwardedNumber: Optional[str]
+    isVoiceMailEnabled: bool
+    voicemailS3Key: Optional[str]
+
+
+def _active_association(twilio_number: TwilioNumber) -> ActiveAssociation:
+    # Same precedence as TwilioNumber._get_active_association, read from the mapped columns
+    if twilio_number.isRoomAssociated:
+        return ActiveAssociation.CONFERENCE
+    if twilio_number.isSupportNumber:
+        return ActiveAssociation.SUPPORT
+    if twilio_number.user is not None:
+        return ActiveAssociation.USER
+    return ActiveAssociation.NONE
+
+
+def _actor_id(twilio_number: TwilioNumber, association: ActiveAssociation) -> Optional[int]:
+    actor = {
+        ActiveAssociation.CONFERENCE: twilio_number.room,
+        ActiveAssociation.SUPPORT: twilio_number.redirect,
+        ActiveAssociation.USER: twilio_number.user,
+    }.get(association)
+    return actor.id if actor is not None else None
+
+
+def build_route(twilio_number: TwilioNumber) -> Optional[Route]:
+    """Routing entry for a number, or None when it cannot receive calls"""
+    if twilio_number.isDeleted or not twilio_number.phoneNumber:
+        return None
+    association = _active_association(twilio_number)
+    return Route(
+        twilioNumberId=twilio_number.id,
+        phoneNumber=twilio_number.phoneNumber,
+        activeAssociation=association,
+        actorId=_actor_id(twilio_number, association),
+        forwardedNumber=twilio_number.forwardedNumber if twilio_number.isForwarded else None,
+        isVoiceMailEnabled=twilio_number.isVoiceMailEnabled,
+        voicemailS3Key=twilio_number.voicemailS3Key,
+    )
+
+
+class CallRoutingTable:
+    """Dialed phone number -> Route, resolved without touching the database"""
+
+    def __init__(self):
+        self._routes: Dict[str, Route] = {}
+        self._numbers: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _routable(query):
+        return query.options(
+            joinedload(TwilioNumber.user),
+            joinedload(TwilioNumber.room),
+            joinedload(TwilioNumber.redirect),
+        )
+
+    def build(self, session: Session) -> int:
+        """Load every routable number in one query and replace the table"""
+        twilio_numbers = session.exec(
+            self._routable(select(TwilioNumber).where(TwilioNumber.isDeleted == False))  # noqa: E712
+        ).unique().all()
+
+        routes: Dict[str, Route] = {}
+        numbers: Dict[int, str] = {}
+        for twilio_number in twilio_numbers:
+            route = build_route(twilio_number)
+            if route:
+                routes[route.phoneNumber] = route
+                numbers[route.twilioNumberId] = route.phoneNumber
+        with self._lock:
+            self._routes, self._numbers = routes, numbers
+        return len(routes)
+
+    def lookup(self, phone_number: str) -> Optional[Route]:
+        return self._routes.get(phone_number)
+
+    def apply(self, twilio_number_id: int, route: Optional[Route]) -> None:
+        """Replace (or drop, when route is None) the entry for one number"""
+        with self._lock:
+            previous = self._numbers.pop(twilio_number_id, None)
+            if previous is not None:
+                self._routes.pop(previous, None)
+            if route is not None:
+                self._routes[route.phoneNumber] = route
+                self._numbers[twilio_number_id] = route.phoneNumber
+
+    def refresh(self, session: Session, twilio_number_ids: Iterable[int]) -> None:
+        """Reload the routes of the given numbers in one query"""
+        ids = list(twilio_number_ids)
+        twilio_numbers = session.exec(
+            self._routable(select(TwilioNumber).where(TwilioNumber.id.in_(ids)))
+        ).unique().all()
+        found = {twilio_number.id: build_route(twilio_number) for twilio_number in twilio_numbers}
+        for twilio_number_id in ids:
+            self.apply(twilio_number_id, found.get(twilio_number_id))
+
+    def apply_forwarding(self, twilio_number_id: int, forwarded_number: Optional[str]) -> None:
+        """Patch the forwarding target of a routed number"""
+        with self._lock:
+            phone_number = self._numbers.get(twilio_number_id)
+            if phone_number is not None:
+                self._routes[phone_number] = replace(self._routes[phone_number], forwardedNumber=forwarded_number)
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def listen(self, session_class=Session) -> None:
+        """
+        Keep the table in sync with committed changes to TwilioNumber rows.
+
+        assign_user, un_assign, mark_redirected, mark_deleted, update_forwarding
+        and the voicemail toggles all flush as updates to the number; the new
+        route is computed at flush time and applied only once the commit succeeds.
+        Bulk forwarding changes (TwilioNumber.update_forwarding_many) bypass the
+        flush and are patched in from session.info on commit; other bulk
+        statements (mark_routes_stale) have their numbers reloaded.
+        """
+        event.listen(session_class, "after_flush", self._collect)
+        event.listen(session_class, "after_commit", self._apply_pending)
+        event.listen(session_class, "after_soft_rollback", self._discard_pending)
+
+    def _collect(self, session, flush_context) -> None:
+        pending = session.info.setdefault(_PENDING_KEY, {})
+        for instance in _changed_numbers(session.new, session.dirty):
+            pending[instance.id] = build_route(instance)
+        for instance in session.deleted:
+            if isinstance(instance, TwilioNumber):
+                pending[instance.id] = None
+
+    def _apply_pending(self, session) -> None:
+        for twilio_number_id, route in session.info.pop(_PENDING_KEY, {}).items():
+            self.apply(twilio_number_id, route)
+        for twilio_number_id, forwarded_number in session.info.pop(FORWARDING_CHANGES_KEY, {}).items():
+            self.apply_forwarding(twilio_number_id, forwarded_number)
+        stale = session.info.pop(ROUTE_REFRESH_KEY, None)
+        if stale:
+            # The committed session cannot emit SQL any more
+            with Session(bind=session.get_bind()) as refresh_session:
+                self.refresh(refresh_session, stale)
+
+    @staticmethod
+    def _discard_pending(session, previous_transaction) -> None:
+        session.info.pop(_PENDING_KEY, None)
+        session.info.pop(FORWARDING_CHANGES_KEY, None)
+        session.info.pop(ROUTE_REFRESH_KEY, None)
+
+
+def _changed_numbers(*collections: Iterable) -> Iterable[TwilioNumber]:
+    for collection in collections:
+        for instance in collection:
+            if isinstance(instance, TwilioNumber):
+                yield instance
+
+
+routing_table = CallRoutingTable()
@@ -0,0 +1,20 @@
+from typing import List, Sequence, Type, TypeVar
+
+from sqlmodel import Session, SQLModel, select
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+
+def load_for_dto(session: Session, model: Type[ModelT], instances: Sequence[ModelT]) -> List[ModelT]:
+    """Re-select instances with model.dto_load_options() in one query, keeping their order.
+
+    Rows deleted in the meantime are left out.
+    """
+    ids = [instance.id for instance in instances]
+    if not ids:
+        return []
+    loaded = session.exec(
+        select(model).where(model.id.in_(ids)).options(*model.dto_load_options())
+    ).all()
+    by_id = {instance.id: instance for instance in loaded}
+    return [by_id[instance_id] for instance_id in ids if instance_id in by_id]
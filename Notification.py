@@ -1,9 +1,27 @@
+from collections import Counter
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, column, event, func, inspect, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
 from typing import Optional
 from app.models.base import AuditableBaseModel
 
+# Matches rows the unread partial index covers
+UNREAD_PREDICATE = column("isRead").isnot(true())
+
+# Session.info key: per-notifier unread deltas collected during a flush
+UNREAD_DELTAS_KEY = "notification_unread_deltas"
+
 class Notification(AuditableBaseModel, table=True):
     __tablename__ = 'notification'
+    __table_args__ = (
+        Index(
+            "ix_notification_notifier_unread",
+            "notifier", "id",
+            postgresql_where=UNREAD_PREDICATE,
+            sqlite_where=UNREAD_PREDICATE,
+        ),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     actor: Optional[str] = Field(default=None)
@@ -13,4 +31,95 @@ class Notification(AuditableBaseModel, table=True):
     isRead: Optional[bool] = Field(default=None)
     
     def __repr__(self):
-        return f"<Notification(id={self.id}, actor='{self.actor}', notifier='{self.notifier}', entity='{self.entity}', entity_type='{self.entity_type}', is_read={self.is_read})>"
\ No newline at end of file
+        return f"<Notification(id={self.id}, actor='{self.actor}', notifier='{self.notifier}', entity='{self.entity}', entity_type='{self.entity_type}', is_read={self.is_read})>"
+
+
+class NotificationUnreadCount(SQLModel, table=True):
+    """Maintained per-notifier unread counter, so badges never scan notifications"""
+    __tablename__ = 'notification_unread_count'
+
+    notifier: str = Field(primary_key=True)
+    unread: int = Field(default=0)
+
+    def __repr__(self):
+        return f"<NotificationUnreadCount(notifier='{self.notifier}', unread={self.unread})>"
+
+
+# Postgres and SQLite (tests, local runs) spell the upsert and the two-argument max differently
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+_GREATEST = {"postgresql": func.greatest, "sqlite": func.max}
+
+
+def adjust_unread(session: Session, deltas: Counter) -> None:
+    """Apply per-notifier unread deltas: one upsert for the increments, an UPDATE per decrement"""
+    dialect = session.get_bind().dialect.name
+    upsert = _UPSERTS.get(dialect, postgresql.insert)
+    greatest = _GREATEST.get(dialect, func.greatest)
+    increments = {notifier: delta for notifier, delta in deltas.items() if delta > 0}
+    if increments:
+        statement = upsert(NotificationUnreadCount).values(
+            [{"notifier": notifier, "unread": unread} for notifier, unread in increments.items()]
+        )
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[NotificationUnreadCount.notifier],
+            set_={"unread": NotificationUnreadCount.unread + statement.excluded.unread},
+        ))
+    for notifier, delta in deltas.items():
+        if delta < 0:
+            session.execute(
+                update(NotificationUnreadCount)
+                .where(NotificationUnreadCount.notifier == notifier)
+                .values(unread=greatest(NotificationUnreadCount.unread + delta, 0))
+            )
+
+
+# Write-through for ORM writes; bulk UPDATE/INSERT statements skip these and must call adjust_unread
+def _record_delta(target: Notification, notifier: Optional[str], delta: int) -> None:
+    session = object_session(target)
+    if notifier and session is not None:
+        session.info.setdefault(UNREAD_DELTAS_KEY, Counter())[notifier] += delta
+
+
+def _previous(target: Notification, key: str):
+    history = inspect(target).attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(target, key)
+
+
+# active_history loads the old value when an expired instance is assigned to
+# (e.g. after a commit), so after_update can tell what the row was before
+@event.listens_for(Notification.isRead, "set", active_history=True)
+@event.listens_for(Notification.notifier, "set", active_history=True)
+def _keep_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+@event.listens_for(Notification, "after_insert")
+def _count_inserted(mapper, connection, target):
+    if target.isRead is not True:
+        _record_delta(target, target.notifier, 1)
+
+
+@event.listens_for(Notification, "after_update")
+def _count_updated(mapper, connection, target):
+    if _previous(target, "isRead") is not True:
+        _record_delta(target, _previous(target, "notifier"), -1)
+    if target.isRead is not True:
+        _record_delta(target, target.notifier, 1)
+
+
+@event.listens_for(Notification, "after_delete")
+def _count_deleted(mapper, connection, target):
+    if target.isRead is not True:
+        _record_delta(target, target.notifier, -1)
+
+
+@event.listens_for(Session, "after_flush")
+def _flush_unread_deltas(session, flush_context):
+    deltas = session.info.pop(UNREAD_DELTAS_KEY, None)
+    if deltas:
+        adjust_unread(session, deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_unread_deltas(session, previous_transaction):
+    session.info.pop(UNREAD_DELTAS_KEY, None)
@@ -0,0 +1,65 @@
+"""
+Notification fan-out and unread badge counts.
+
+The per-notifier counters are kept in step with every ORM insert, update and
+delete of a Notification by the listeners in app.models.notification, applied
+once per flush. Bulk statements bypass those listeners, so code issuing its
+own UPDATE or INSERT against notification must call adjust_unread, as
+mark_all_read does.
+"""
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from app.models.notification import Notification, NotificationUnreadCount, UNREAD_PREDICATE, adjust_unread
+
+
+def fan_out(session: Session, actor: Optional[str], notifiers: Iterable[str],
+            entity: Optional[str], entity_type: Optional[str]) -> List[Notification]:
+    """Create one notification per notifier; the rows go out as a single multi-row INSERT, counted in one upsert"""
+    notifications = [
+        Notification(actor=actor, notifier=notifier, entity=entity, entity_type=entity_type, isRead=False)
+        for notifier in notifiers
+    ]
+    if not notifications:
+        return []
+    session.add_all(notifications)
+    session.flush()
+    return notifications
+
+
+def unread_count(session: Session, notifier: str) -> int:
+    """Badge count: a primary key lookup on the counter table"""
+    unread = session.exec(
+        select(NotificationUnreadCount.unread).where(NotificationUnreadCount.notifier == notifier)
+    ).first()
+    return unread or 0
+
+
+def mark_all_read(session: Session, notifier: str, up_to_id: int) -> int:
+    """Mark every unread notification up to and including up_to_id as read"""
+    result = session.exec(
+        update(Notification)
+        .where(Notification.notifier == notifier)
+        .where(Notification.id <= up_to_id)
+        .where(UNREAD_PREDICATE)
+        .values(isRead=True)
+        .execution_options(synchronize_session=False)
+    )
+    # A bulk UPDATE: the flush listeners never see these rows
+    adjust_unread(session, Counter({notifier: -result.rowcount}))
+    return result.rowcount
+
+
+def rebuild_unread_counts(session: Session) -> None:
+    """Recompute every counter from the notifications; a repair job, not for the request path"""
+    session.exec(update(NotificationUnreadCount).values(unread=0))
+    counts = session.exec(
+        select(Notification.notifier, func.count())
+        .where(UNREAD_PREDICATE)
+        .where(Notification.notifier.isnot(None))
+        .group_by(Notification.notifier)
+    ).all()
+    adjust_unread(session, Counter(dict(counts)))
@@ -0,0 +1,147 @@
+import random
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+from sqlalchemy import and_, update
+from sqlmodel import Session, select
+
+from app.exceptions.validation_exception import ValidationException
+from app.models.twilio_number import TwilioNumber, mark_routes_stale
+
+_NUMBERS = TwilioNumber.__table__
+
+
+def free_filter():
+    """Unassigned, live numbers: what is_redirect_assignable accepts, minus support lines"""
+    columns = _NUMBERS.c
+    return and_(
+        columns.user.is_(None),
+        columns.isDeleted.is_(False),
+        columns.isRoomAssociated.is_(False),
+        columns.isSupportNumber.is_(False),
+    )
+
+
+def _assignment(user_id: Optional[int]) -> dict:
+    # Same end state as TwilioNumber.assign_user / mark_redirected
+    if user_id is None:
+        return {"isSupportNumber": True}
+    return {"user": user_id}
+
+
+class NumberAllocator:
+    """
+    Claims free numbers without two workers ever getting the same one.
+
+    By default every claim is one SELECT ... FOR UPDATE SKIP LOCKED plus a bulk
+    UPDATE in the caller's transaction, so concurrent claims skip each other's
+    rows instead of queueing on them. With warm=True candidate ids are kept in
+    an in-process free list refilled refill_size at a time, and a claim is a
+    single conditional UPDATE ... RETURNING; ids another worker took in the
+    meantime simply fail the condition and are dropped.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 warm: bool = False, refill_size: int = 500, max_attempts: int = 3):
+        if warm and session_factory is None:
+            raise ValueError("a warm free list needs a session_factory to refill from")
+        self.session_factory = session_factory
+        self.warm = warm
+        self.refill_size = refill_size
+        self.max_attempts = max_attempts
+        self._free: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+        self.claimed = 0
+        self.refills = 0
+        self.lost_races = 0
+
+    def assign_to_user(self, session: Session, user_id: int, count: int = 1) -> List[int]:
+        """Assign count free numbers to the user; returns their ids"""
+        return self._claim(session, count, user_id)
+
+    def assign_redirect(self, session: Session, count: int = 1) -> List[int]:
+        """Mark count free numbers as support numbers; returns their ids"""
+        return self._claim(session, count, None)
+
+    def _claim(self, session: Session, count: int, user_id: Optional[int]) -> List[int]:
+        if count < 1:
+            raise ValidationException("At least one number must be requested.")
+        if self.warm:
+            ids = self._claim_warm(session, count, user_id)
+        else:
+            ids = self._claim_locked(session, count, user_id)
+        # Bulk UPDATEs skip the flush the call-routing table listens to
+        mark_routes_stale(session, ids)
+        self.claimed += len(ids)
+        return ids
+
+    @staticmethod
+    def _claim_locked(session: Session, count: int, user_id: Optional[int]) -> List[int]:
+        ids = list(session.execute(
+            select(_NUMBERS.c.id)
+            .where(free_filter())
+            .order_by(_NUMBERS.c.id)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        ).scalars())
+        if len(ids) < count:
+            raise ValidationException("Not enough free numbers.")
+        session.execute(update(_NUMBERS).where(_NUMBERS.c.id.in_(ids)).values(_assignment(user_id)))
+        return ids
+
+    def _claim_warm(self, session: Session, count: int, user_id: Optional[int]) -> List[int]:
+        claimed: List[int] = []
+        for _ in range(self.max_attempts):
+            candidates = self._take(count - len(claimed))
+            if not candidates:
+                break
+            won = list(session.execute(
+                update(_NUMBERS)
+                .where(_NUMBERS.c.id.in_(candidates), free_filter())
+                .values(_assignment(user_id))
+                .returning(_NUMBERS.c.id)
+            ).scalars())
+            self.lost_races += len(candidates) - len(won)
+            claimed.extend(won)
+            if len(claimed) == count:
+                return claimed
+        # The caller rolls back, releasing any partial claim
+        raise ValidationException("Not enough free numbers.")
+
+    def _take(self, count: int) -> List[int]:
+        with self._lock:
+            if len(self._free) < count:
+                self._refill()
+            return [self._free.popleft() for _ in range(min(count, len(self._free)))]
+
+    def _refill(self) -> None:
+        # Snapshot read in its own short transaction; claims re-check freeness
+        with self.session_factory() as session:
+            ids = list(session.execute(
+                select(_NUMBERS.c.id)
+                .where(free_filter())
+                .limit(self.refill_size)
+                .with_for_update(skip_locked=True)
+            ).scalars())
+            session.rollback()
+        # Workers refilling from the same rows would collide on every claim
+        random.shuffle(ids)
+        known = set(self._free)
+        self._free.extend(number_id for number_id in ids if number_id not in known)
+        self.refills += 1
+
+    def release(self, number_ids: List[int]) -> None:
+        """Hand ids back to the free list, e.g. after the claiming transaction rolled back"""
+        if self.warm:
+            with self._lock:
+                self._free.extendleft(number_ids)
+
+    def stats(self) -> dict:
+        return {
+            "claimed": self.claimed,
+            "refills": self.refills,
+            "lost_races": self.lost_races,
+            "free_list": len(self._free),
+        }
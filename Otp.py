@@ -7,9 +7,9 @@ class Otp(SQLModel, table=True):
     __tablename__ = 'otp'
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    user: Optional[int] = Field(default=None, foreign_key="user.id")
+    user: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     value: Optional[str] = Field(default=None)
-    validUntil: Optional[datetime] = Field(default=None, alias="valid_until")
+    validUntil: Optional[datetime] = Field(default=None, alias="valid_until", index=True)
     verified: Optional[bool] = Field(default=None)
     verifiedAt: Optional[datetime] = Field(default=None, alias="verified_at")
     
@@ -0,0 +1,198 @@
+import hmac
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Protocol, Tuple, Union
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.exceptions.validation_exception import ValidationException
+from app.models.otp import Otp
+
+logger = logging.getLogger(__name__)
+
+
+class OtpBackend(Protocol):
+    """
+    Subset of the Redis command set the store relies on.
+
+    A redis.Redis client satisfies it as-is; get may return bytes (the default
+    without decode_responses=True) or str.
+    """
+
+    def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]: ...
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+
+class InMemoryOtpBackend:
+    """Process-local TTL map implementing OtpBackend"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._data[key] = (str(value), time.monotonic() + ex if ex else None)
+            return True
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[key] = (str(value), entry[1] if entry else None)
+            return value
+
+    def purge(self) -> None:
+        """Drop expired keys; lookups also expire lazily"""
+        with self._lock:
+            for key in list(self._data):
+                self._live(key)
+
+
+class OtpStore:
+    """Issues and verifies one-time passwords in O(1) against a TTL backend"""
+
+    def __init__(self, backend: Optional[OtpBackend] = None, ttl: int = 300, digits: int = 6,
+                 max_issues_per_window: int = 5, rate_window: int = 900, max_verify_attempts: int = 5):
+        self.backend = backend or InMemoryOtpBackend()
+        self.ttl = ttl
+        self.digits = digits
+        self.max_issues_per_window = max_issues_per_window
+        self.rate_window = rate_window
+        self.max_verify_attempts = max_verify_attempts
+
+    @staticmethod
+    def _key(kind: str, user_id: int) -> str:
+        return f"otp:{kind}:{user_id}"
+
+    def _hit(self, key: str, window: int) -> int:
+        # SET NX EX creates the counter with its TTL in one step and INCR keeps
+        # that TTL, so a crash between the two never leaves a key that lives forever
+        self.backend.set(key, 0, ex=window, nx=True)
+        return self.backend.incr(key)
+
+    def issue(self, user_id: int) -> str:
+        """Create a new OTP for the user, replacing any previous one"""
+        if self._hit(self._key("issued", user_id), self.rate_window) > self.max_issues_per_window:
+            raise ValidationException("Too many OTP requests, try again later.")
+        value = f"{secrets.randbelow(10 ** self.digits):0{self.digits}d}"
+        self.backend.set(self._key("value", user_id), value, ex=self.ttl)
+        self.backend.delete(self._key("failed", user_id))
+        return value
+
+    def verify(self, user_id: int, value: str) -> bool:
+        """Check and consume the user's OTP"""
+        key = self._key("value", user_id)
+        expected = self.backend.get(key)
+        if expected is None:
+            return False
+        if isinstance(expected, str):
+            expected = expected.encode()
+        if hmac.compare_digest(expected, value.encode()):
+            self.backend.delete(key)
+            self.backend.delete(self._key("failed", user_id))
+            return True
+        # Too many wrong guesses burns the OTP
+        if self._hit(self._key("failed", user_id), self.ttl) >= self.max_verify_attempts:
+            self.backend.delete(key)
+        return False
+
+
+def purge_expired_otps(session_factory: Callable[[], Session], batch_size: int = 1000,
+                       now: Optional[datetime] = None) -> int:
+    """Delete expired Otp rows in bounded batches so no single statement holds long locks"""
+    now = now or datetime.now()
+    purged = 0
+    while True:
+        with session_factory() as session:
+            ids = session.exec(
+                select(Otp.id).where(Otp.validUntil < now).limit(batch_size)
+            ).all()
+            if not ids:
+                return purged
+            session.exec(delete(Otp).where(Otp.id.in_(ids)))
+            session.commit()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            return purged
+
+
+class OtpSweeper:
+    """
+    Background thread that periodically purges expired Otp rows.
+
+    A failed sweep is logged and the wait before the next one doubles, up to
+    max_backoff, until a sweep succeeds again.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float = 300,
+                 batch_size: int = 1000, max_backoff: float = 3600):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.purged = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="otp-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _next_delay(self) -> float:
+        if not self.consecutive_failures:
+            return self.interval
+        return min(self.interval * 2 ** min(self.consecutive_failures, 20), max(self.max_backoff, self.interval))
+
+    def sweep_once(self) -> None:
+        try:
+            self.purged += purge_expired_otps(self.session_factory, self.batch_size)
+        except Exception:
+            self.failures += 1
+            self.consecutive_failures += 1
+            logger.exception("OTP sweep failed (%d in a row); retrying in %.0fs",
+                             self.consecutive_failures, self._next_delay())
+            return
+        self.consecutive_failures = 0
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._next_delay()):
+            self.sweep_once()
@@ -2,6 +2,7 @@ from sqlmodel import SQLModel, Field
 from typing import Optional
 from enum import Enum
 
+# Mirrored in Authentication/permissions.py; update both together
 class RoleName(str, Enum):
     EMPLOYEE = "EMPLOYEE"
     ADMIN = "ADMIN"
@@ -1,5 +1,10 @@
-from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, Set, TYPE_CHECKING
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from sqlmodel import SQLModel, Field, Relationship, Session
+from sqlalchemy import Boolean, Integer, String, column, update, values
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Dict, Iterable, Optional, Set, List, Sequence, TYPE_CHECKING
 from app.models.base import AuditableBaseModel
 from app.models.dto.twilio_number_dto import TwilioNumberDto
 from app.models.dto.twilio_forward_dto import TwilioForwardDto
@@ -7,6 +12,7 @@ from app.models.dto.actor import Actor
 from app.models.dto.conference_dto import ConferenceDto
 from app.models.dto.user_dto import UserDto
 from app.models.dto.support_line_dto import SupportLineDto
+from app.models.dto_loading import load_for_dto
 from app.models.enums.active_association import ActiveAssociation
 from app.utils.twilio_utility import is_phone_number
 from app.exceptions.validation_exception import ValidationException
@@ -18,6 +24,54 @@ if TYPE_CHECKING:
     from app.models.call_redirect import CallRedirect
     from app.models.call_level import CallLevel
 
+# Session.info key: number id -> new forwarded number (None when not forwarded)
+FORWARDING_CHANGES_KEY = "twilio_forwarding_changes"
+
+# Session.info key: ids of numbers changed by bulk statements, whose routes need reloading
+ROUTE_REFRESH_KEY = "twilio_route_refresh"
+
+
+def mark_routes_stale(session: Session, twilio_number_ids: Iterable[int]) -> None:
+    """Have the call-routing table reload these numbers once the transaction commits"""
+    session.info.setdefault(ROUTE_REFRESH_KEY, set()).update(twilio_number_ids)
+
+_FORMATTING = re.compile(r"[\s\-().]")
+_E164 = re.compile(r"^\+[1-9]\d{1,14}$")
+
+
+@lru_cache(maxsize=4096)
+def normalize_phone_number(value: str) -> Optional[str]:
+    """
+    E.164 form of value, or None when it is not a valid phone number.
+
+    Only explicit international numbers (+ and the country code) are accepted;
+    a national number means different things in different countries, so it
+    raises ValueError rather than being guessed into one.
+    """
+    candidate = _FORMATTING.sub("", value)
+    if not candidate.startswith("+"):
+        raise ValueError(f"{value!r} has no country code; expected +<country code><number>")
+    # forwardedNumber holds at most 13 characters
+    if len(candidate) > 13 or not _E164.match(candidate) or not is_phone_number(candidate):
+        return None
+    return candidate
+
+
+@dataclass(frozen=True)
+class ForwardingUpdate:
+    twilioNumberId: int
+    forwardTo: Optional[str]
+    isEnabled: bool
+
+
+@dataclass(frozen=True)
+class ForwardingResult:
+    twilioNumberId: int
+    forwardedNumber: Optional[str]
+    isForwarded: bool
+    status: str  # "updated", "cleared" (invalid target), "rejected" (no country code) or "not_found"
+
+
 class TwilioNumber(AuditableBaseModel, table=True):
     __tablename__ = 'twilio_number'
     
@@ -58,6 +112,58 @@ class TwilioNumber(AuditableBaseModel, table=True):
             self.forwardedNumber = None
             self.isForwarded = False
 
+    @classmethod
+    def update_forwarding_many(cls, session: Session,
+                               updates: Iterable[ForwardingUpdate]) -> List[ForwardingResult]:
+        """
+        Apply many forwarding changes with one UPDATE ... FROM (VALUES ...).
+
+        Targets must be E.164 (see normalize_phone_number); like
+        update_forwarding, an invalid or empty target clears forwarding, while
+        a target without a country code is rejected and leaves the number
+        unchanged. Later entries for the same number win. Returns one result
+        per number, in first-seen order.
+        """
+        # None marks a rejected entry
+        changes: Dict[int, Optional[tuple]] = {}
+        for entry in updates:
+            try:
+                forward_to = normalize_phone_number(entry.forwardTo) if entry.forwardTo else None
+            except ValueError:
+                changes[entry.twilioNumberId] = None
+                continue
+            changes[entry.twilioNumberId] = (forward_to, bool(forward_to) and entry.isEnabled)
+        accepted = {number_id: change for number_id, change in changes.items() if change is not None}
+        if not accepted:
+            return [ForwardingResult(number_id, None, False, "rejected") for number_id in changes]
+
+        table = cls.__table__
+        forwarding = values(
+            column("id", Integer), column("forwardedNumber", String), column("isForwarded", Boolean),
+            name="forwarding",
+        ).data([(number_id, forward_to, enabled) for number_id, (forward_to, enabled) in accepted.items()])
+        updated = set(session.execute(
+            update(table)
+            .where(table.c.id == forwarding.c.id)
+            .values(forwardedNumber=forwarding.c.forwardedNumber, isForwarded=forwarding.c.isForwarded)
+            .returning(table.c.id)
+        ).scalars())
+
+        # Picked up by the call-routing table once the transaction commits
+        pending = session.info.setdefault(FORWARDING_CHANGES_KEY, {})
+        results = []
+        for number_id, change in changes.items():
+            if change is None:
+                results.append(ForwardingResult(number_id, None, False, "rejected"))
+                continue
+            forward_to, enabled = change
+            if number_id not in updated:
+                results.append(ForwardingResult(number_id, None, False, "not_found"))
+                continue
+            pending[number_id] = forward_to if enabled else None
+            results.append(ForwardingResult(number_id, forward_to, enabled, "updated" if forward_to else "cleared"))
+        return results
+
     def to_dto(self, exclude_actor_data: bool = False) -> TwilioNumberDto:
         """Convert to DTO"""
         return TwilioNumberDto(
@@ -71,6 +177,28 @@ class TwilioNumber(AuditableBaseModel, table=True):
             isVoiceMailEnabled=self.isVoiceMailEnabled
         )
     
+    @classmethod
+    def dto_load_options(cls, include_user: bool = True) -> list:
+        """Usage report, room and redirect behind the actor; the owner unless the caller already holds it"""
+        # The usage report resolves its number and owner from the identity map
+        options = [
+            selectinload(cls.twilioNumberUsage),
+            selectinload(cls.room),
+            selectinload(cls.redirect),
+        ]
+        if include_user:
+            options.append(joinedload(cls.user))
+        return options
+
+    @classmethod
+    def to_dto_many(cls, session: Session, twilio_numbers: Sequence["TwilioNumber"],
+                    exclude_actor_data: bool = False) -> List[TwilioNumberDto]:
+        """Convert many numbers to DTOs with a fixed number of queries"""
+        return [
+            twilio_number.to_dto(exclude_actor_data)
+            for twilio_number in load_for_dto(session, cls, twilio_numbers)
+        ]
+
     def _get_active_association(self) -> ActiveAssociation:
         """Get the active association type"""
         if not self._is_assigned():
@@ -1,17 +1,38 @@
-from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, TYPE_CHECKING
+from sqlmodel import SQLModel, Field, Relationship, Session, select
+from sqlalchemy import Column, ForeignKey, Integer, func, update
+from sqlalchemy.orm import joinedload
+from typing import Optional, List, Sequence, TYPE_CHECKING
 from datetime import datetime, timedelta
 from app.models.dto.twilio_number_usage_dto import TwilioNumberUsageDto
+from app.models.dto_loading import load_for_dto
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 if TYPE_CHECKING:
     from app.models.twilio_number import TwilioNumber
 
+# Days without usage -> flag column
+STALENESS_THRESHOLDS = {
+    15: "lastUsedMoreThan15Days",
+    30: "lastUsedMoreThan30Days",
+    60: "lastUsedMoreThan60Days",
+}
+
+# Stands in for a missing date, so "never used" counts as stale
+_NEVER_USED = datetime(1970, 1, 1)
+
 class TwilioNumberUsage(SQLModel, table=True):
     __tablename__ = 'twilio_number_usage'
     
     id: Optional[int] = Field(default=None, primary_key=True)
     ownerName: Optional[str] = Field(default=None, alias="owner_name")
-    twilioNumber: Optional[int] = Field(default=None, foreign_key="twilio_number.id")
+    # Stored in the "twilioNumber" column; the attribute name is taken by the relationship below
+    twilioNumberId: Optional[int] = Field(default=None, sa_column=Column(
+        "twilioNumber", Integer, ForeignKey("twilio_number.id"), unique=True, key="twilioNumberId",
+    ))
     lastIncomingCallDate: Optional[datetime] = Field(default=None, alias="last_incoming_call_date")
     lastOutgoingCallDate: Optional[datetime] = Field(default=None, alias="last_outgoing_call_date")
     lastIncomingSmsDate: Optional[datetime] = Field(default=None, alias="last_incoming_sms_date")
@@ -42,6 +63,18 @@ class TwilioNumberUsage(SQLModel, table=True):
             owner_softphone=owner_softphone
         )
     
+    @classmethod
+    def dto_load_options(cls) -> list:
+        """The number and its owner, which to_dto reports as the softphone owner"""
+        from app.models.twilio_number import TwilioNumber
+
+        return [joinedload(cls.twilioNumber).joinedload(TwilioNumber.user)]
+
+    @classmethod
+    def to_dto_many(cls, session: Session, usages: Sequence["TwilioNumberUsage"]) -> List[TwilioNumberUsageDto]:
+        """Convert many usage rows to DTOs with a single query"""
+        return [usage.to_dto() for usage in load_for_dto(session, cls, usages)]
+
     def set_last_incoming_call_date(self, last_incoming_call_date: datetime) -> None:
         """Set last incoming call date only if it's newer"""
         if (self.last_incoming_call_date is None or 
@@ -94,5 +127,67 @@ class TwilioNumberUsage(SQLModel, table=True):
                 (self.last_outgoing_call_date is None or self.last_outgoing_call_date < dt) and
                 (self.last_outgoing_sms_date is None or self.last_outgoing_sms_date < dt))
     
+    @classmethod
+    def last_used_expression(cls):
+        """SQL expression for the most recent of the four usage dates"""
+        return func.greatest(
+            func.coalesce(cls.lastIncomingCallDate, _NEVER_USED),
+            func.coalesce(cls.lastIncomingSmsDate, _NEVER_USED),
+            func.coalesce(cls.lastOutgoingCallDate, _NEVER_USED),
+            func.coalesce(cls.lastOutgoingSmsDate, _NEVER_USED),
+        )
+
+    @classmethod
+    def stale_filter(cls, days: int, now: Optional[datetime] = None):
+        """WHERE clause matching rows unused for more than the given days"""
+        now = now or datetime.now()
+        return cls.last_used_expression() < now - timedelta(days=days)
+
+    @classmethod
+    def select_stale(cls, days: int, now: Optional[datetime] = None):
+        """Select rows unused for more than the given days, computed from the dates"""
+        return select(cls).where(cls.stale_filter(days, now))
+
+    @classmethod
+    def refresh_staleness_flags(cls, session: Session, now: Optional[datetime] = None) -> int:
+        """Recompute the 15/30/60 day flags for every row in a single UPDATE"""
+        now = now or datetime.now()
+        result = session.exec(
+            update(cls)
+            .values({
+                getattr(cls, column): cls.stale_filter(days, now)
+                for days, column in STALENESS_THRESHOLDS.items()
+            })
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @staticmethod
+    def refresh_staleness_flags_in_memory(usages: Sequence["TwilioNumberUsage"],
+                                          now: Optional[datetime] = None) -> None:
+        """Recompute the flags for already loaded rows, vectorized when NumPy is available"""
+        now = now or datetime.now()
+        # Same columns as last_used_expression
+        rows = [
+            [usage.lastIncomingCallDate or _NEVER_USED,
+             usage.lastIncomingSmsDate or _NEVER_USED,
+             usage.lastOutgoingCallDate or _NEVER_USED,
+             usage.lastOutgoingSmsDate or _NEVER_USED]
+            for usage in usages
+        ]
+        if np is None:
+            for usage, dates in zip(usages, rows):
+                last_used = max(dates)
+                for days, column in STALENESS_THRESHOLDS.items():
+                    setattr(usage, column, last_used < now - timedelta(days=days))
+            return
+
+        dates = np.array(rows, dtype="datetime64[us]").reshape(-1, 4)
+        last_used = dates.max(axis=1)
+        for days, column in STALENESS_THRESHOLDS.items():
+            stale = last_used < np.datetime64(now - timedelta(days=days), "us")
+            for usage, flag in zip(usages, stale.tolist()):
+                setattr(usage, column, flag)
+
     def __repr__(self):
         return f"<TwilioNumberUsage(id={self.id}, owner_name='{self.owner_name}', twilio_number_id={self.twilio_number_id})>"
\ No newline at end of file
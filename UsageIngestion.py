@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.models.twilio_number import TwilioNumber
+from app.models.twilio_number_usage import TwilioNumberUsage
+
+logger = logging.getLogger(__name__)
+
+
+class Direction(str, Enum):
+    INCOMING = "INCOMING"
+    OUTGOING = "OUTGOING"
+
+
+class Channel(str, Enum):
+    CALL = "CALL"
+    SMS = "SMS"
+
+
+# (direction, channel) -> TwilioNumberUsage date column
+USAGE_COLUMNS = {
+    (Direction.INCOMING, Channel.CALL): "lastIncomingCallDate",
+    (Direction.OUTGOING, Channel.CALL): "lastOutgoingCallDate",
+    (Direction.INCOMING, Channel.SMS): "lastIncomingSmsDate",
+    (Direction.OUTGOING, Channel.SMS): "lastOutgoingSmsDate",
+}
+
+
+class UsageIngestor:
+    """
+    Buffers call/SMS usage events and upserts the newest date per number in bulk.
+
+    Events for numbers that do not exist are dropped at flush time. Batches
+    that fail for other reasons are retried up to max_retries times, and
+    while the database is down the buffer stops growing at max_pending keys.
+    New events beyond that are dropped and counted instead of raised to the caller.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session],
+                 max_buffer: int = 5000, flush_interval: float = 1.0,
+                 max_retries: int = 5, max_pending: Optional[int] = None):
+        self.session_factory = session_factory
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_pending = max_pending or max_buffer * 10
+        self._buffer: Dict[Tuple[int, str], datetime] = {}
+        self._attempts: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.events_received = 0
+        self.rows_flushed = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.rows_dropped = 0
+        self.events_dropped = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def record(self, twilio_number_id: int, direction: Direction, channel: Channel, at: datetime) -> None:
+        """Record one event, keeping only the newest date per (number, direction, channel)"""
+        key = (twilio_number_id, USAGE_COLUMNS[(direction, channel)])
+        with self._lock:
+            self.events_received += 1
+            current = self._buffer.get(key)
+            if current is None and len(self._buffer) >= self.max_pending:
+                self.events_dropped += 1
+                return
+            if current is None or current < at:
+                self._buffer[key] = at
+            full = len(self._buffer) >= self.max_buffer
+        if full and not self._flush_lock.locked():
+            try:
+                self.flush()
+            except Exception:
+                # Requeued or dropped by flush; never fail the webhook over it
+                logger.exception("usage flush failed")
+
+    def flush(self) -> int:
+        """Write the buffered dates in a single upsert; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, {}
+            if not batch:
+                return 0
+
+            rows: Dict[int, dict] = {}
+            for (twilio_number_id, column), at in batch.items():
+                row = rows.setdefault(twilio_number_id, {
+                    "twilioNumberId": twilio_number_id,
+                    **{name: None for name in USAGE_COLUMNS.values()},
+                })
+                row[column] = at
+
+            started = time.perf_counter()
+            try:
+                with self.session_factory() as session:
+                    known = set(session.exec(
+                        select(TwilioNumber.__table__.c.id).where(TwilioNumber.__table__.c.id.in_(list(rows)))
+                    ).all())
+                    unknown = len(rows) - len(known)
+                    if unknown:
+                        self.rows_dropped += unknown
+                        logger.warning("dropping usage for %d unknown twilio numbers", unknown)
+                        rows = {number_id: row for number_id, row in rows.items() if number_id in known}
+                    if rows:
+                        session.exec(self._upsert(list(rows.values())))
+                        session.commit()
+            except IntegrityError:
+                # A number deleted since the check; retrying would fail the same way
+                self.flush_errors += 1
+                self.rows_dropped += len(rows)
+                self._forget(batch)
+                logger.exception("dropping usage batch of %d rows", len(rows))
+                raise
+            except Exception:
+                self.flush_errors += 1
+                self._requeue(batch)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+            self.flush_count += 1
+            self.rows_flushed += len(rows)
+            self._forget(batch)
+            return len(rows)
+
+    @staticmethod
+    def _upsert(rows: list):
+        """INSERT ... ON CONFLICT keeping the newest of the stored and incoming dates"""
+        statement = insert(TwilioNumberUsage.__table__).values(rows)
+        table = TwilioNumberUsage.__table__
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.twilioNumberId],
+            # GREATEST ignores NULLs, so columns without new events keep their value
+            set_={
+                name: func.greatest(table.c[name], statement.excluded[name])
+                for name in USAGE_COLUMNS.values()
+            },
+        )
+
+    def _forget(self, batch: Dict[Tuple[int, str], datetime]) -> None:
+        """Drop the retry counts of keys that were written or given up on"""
+        with self._lock:
+            for key in batch:
+                self._attempts.pop(key, None)
+
+    def _requeue(self, batch: Dict[Tuple[int, str], datetime]) -> None:
+        """Merge a failed batch back so the next flush retries it, up to max_retries times"""
+        with self._lock:
+            for key, at in batch.items():
+                attempts = self._attempts.get(key, 0) + 1
+                current = self._buffer.get(key)
+                if attempts > self.max_retries or (current is None and len(self._buffer) >= self.max_pending):
+                    self._attempts.pop(key, None)
+                    self.rows_dropped += 1
+                    continue
+                self._attempts[key] = attempts
+                if current is None or current < at:
+                    self._buffer[key] = at
+
+    def start(self) -> None:
+        """Flush periodically on a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-ingestor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and flush what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Already requeued or dropped; try again on the next tick
+                logger.exception("usage flush failed")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            queue_depth = len(self._buffer)
+        return {
+            "queue_depth": queue_depth,
+            "events_received": self.events_received,
+            "rows_flushed": self.rows_flushed,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "rows_dropped": self.rows_dropped,
+            "events_dropped": self.events_dropped,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
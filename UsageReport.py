@@ -0,0 +1,209 @@
+"""
+Streaming export of the usage report for the whole number inventory.
+
+    python UsageReport.py --format csv --stale 30 --output unused.csv
+
+Rows come from one query over usage, number and user read through a
+server-side cursor, and are written out one chunk at a time, so memory
+stays bounded by --chunk-size however many numbers there are.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import create_engine
+from sqlmodel import Session, select
+
+from app.models.twilio_number import TwilioNumber
+from app.models.twilio_number_usage import STALENESS_THRESHOLDS, TwilioNumberUsage
+from app.models.user import User
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+NO_USER_ASSIGNED = "~~No User Assigned~~"
+
+# Output column -> selected expression, in the order of TwilioNumberUsageDto
+_USAGE = TwilioNumberUsage.__table__.c
+_NUMBER = TwilioNumber.__table__.c
+_USER = User.__table__.c
+REPORT_COLUMNS = {
+    "twilio_number": _NUMBER.phoneNumber,
+    "owner_twilio": _USAGE.ownerName,
+    "owner_softphone": None,  # derived from the user's names below
+    "last_incoming_call_date": _USAGE.lastIncomingCallDate,
+    "last_incoming_sms_date": _USAGE.lastIncomingSmsDate,
+    "last_outgoing_call_date": _USAGE.lastOutgoingCallDate,
+    "last_outgoing_sms_date": _USAGE.lastOutgoingSmsDate,
+    "last_used_more_than_15_days": _USAGE.lastUsedMoreThan15Days,
+    "last_used_more_than_30_days": _USAGE.lastUsedMoreThan30Days,
+    "last_used_more_than_60_days": _USAGE.lastUsedMoreThan60Days,
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def report_query(stale_days: Optional[int] = None):
+    """Usage rows joined to their number and owner; stale_days filters on a staleness flag"""
+    selected = [column.label(name) for name, column in REPORT_COLUMNS.items() if column is not None]
+    query = (
+        select(*selected, _USER.id.label("user_id"), _USER.firstName, _USER.lastName)
+        .select_from(TwilioNumberUsage.__table__)
+        .outerjoin(TwilioNumber.__table__, _USAGE.twilioNumberId == _NUMBER.id)
+        .outerjoin(User.__table__, _NUMBER.user == _USER.id)
+        .order_by(_USAGE.id)
+    )
+    if stale_days is not None:
+        if stale_days not in STALENESS_THRESHOLDS:
+            raise ValueError(f"stale_days must be one of {sorted(STALENESS_THRESHOLDS)}")
+        query = query.where(_USAGE[STALENESS_THRESHOLDS[stale_days]].is_(True))
+    return query
+
+
+def iter_report(session: Session, stale_days: Optional[int] = None,
+                chunk_size: int = 5000) -> Iterator[List[Dict]]:
+    """Yield report rows in chunks of chunk_size, read through a server-side cursor"""
+    result = session.execute(
+        report_query(stale_days).execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for partition in result.mappings().partitions():
+        chunk = []
+        for row in partition:
+            record = {name: row[name] if column is not None else None for name, column in REPORT_COLUMNS.items()}
+            # Same rule as User.get_full_name / TwilioNumberUsage.to_dto
+            if row["user_id"] is None:
+                record["owner_softphone"] = NO_USER_ASSIGNED
+            else:
+                record["owner_softphone"] = f"{row['firstName'] or ''} {row['lastName'] or ''}".strip()
+            chunk.append(record)
+        yield chunk
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_csv(session: Session, stale_days: Optional[int] = None, chunk_size: int = 5000) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(REPORT_COLUMNS))
+    writer.writeheader()
+    # The header goes out before the query runs
+    yield buffer.getvalue().encode()
+    for chunk in iter_report(session, stale_days, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+
+
+def export_ndjson(session: Session, stale_days: Optional[int] = None, chunk_size: int = 5000) -> Iterator[bytes]:
+    for chunk in iter_report(session, stale_days, chunk_size):
+        yield "".join(json.dumps(record, default=_default) + "\n" for record in chunk).encode()
+
+
+class _ChunkSink:
+    """Write-only file object the Parquet writer fills and export_parquet drains"""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def export_parquet(session: Session, stale_days: Optional[int] = None, chunk_size: int = 5000) -> Iterator[bytes]:
+    """One Parquet row group per chunk; needs pyarrow"""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    schema = pa.schema(
+        [("twilio_number", pa.string()), ("owner_twilio", pa.string()), ("owner_softphone", pa.string())]
+        + [(name, pa.timestamp("us")) for name in REPORT_COLUMNS if name.startswith("last_") and name.endswith("_date")]
+        + [(name, pa.bool_()) for name in REPORT_COLUMNS if name.endswith("_days")]
+    )
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in iter_report(session, stale_days, chunk_size):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {"csv": export_csv, "ndjson": export_ndjson, "parquet": export_parquet}
+
+
+def export(session: Session, format: str = "csv", stale_days: Optional[int] = None,
+           chunk_size: int = 5000) -> Iterator[bytes]:
+    """
+    Stream the report as bytes in the given format.
+
+    Plug into a web response with e.g.
+    StreamingResponse(export(session, "csv", 30), media_type=MEDIA_TYPES["csv"]);
+    the session must stay open until the iterator is exhausted.
+    """
+    return EXPORTERS[format](session, stale_days, chunk_size)
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="csv")
+    parser.add_argument("--stale", type=int, choices=sorted(STALENESS_THRESHOLDS),
+                        help="only numbers flagged unused for more than this many days")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        with Session(engine) as session:
+            for data in export(session, args.format, args.stale, args.chunk_size):
+                out.write(data)
+    finally:
+        if args.output:
+            out.close()
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
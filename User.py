@@ -1,7 +1,10 @@
-from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, Set, List, Collection, TYPE_CHECKING
+from sqlmodel import SQLModel, Field, Relationship, Session, select
+from sqlalchemy import delete, insert, tuple_, update
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Optional, Set, List, Collection, Dict, Mapping, Sequence, Tuple, TYPE_CHECKING
 from app.models.base import AuditableBaseModel
 from app.models.dto.user_dto import UserDto
+from app.models.dto_loading import load_for_dto
 from app.models.enums.job_type import JobType
 
 if TYPE_CHECKING:
@@ -64,6 +67,25 @@ class User(AuditableBaseModel, table=True):
             isEnabled=self.isEnabled
         )
     
+    @classmethod
+    def dto_load_options(cls) -> list:
+        """Companies and role, plus every number with the relationships its DTO embeds"""
+        from app.models.twilio_number import TwilioNumber
+
+        return [
+            selectinload(cls.companies),
+            joinedload(cls.role),
+            # Each number's owner is this user, already in the identity map
+            selectinload(cls.twilioNumbers).options(
+                *TwilioNumber.dto_load_options(include_user=False)
+            ),
+        ]
+
+    @classmethod
+    def to_dto_many(cls, session: Session, users: Sequence["User"]) -> List[UserDto]:
+        """Convert many users to DTOs with a fixed number of queries"""
+        return [user.to_dto() for user in load_for_dto(session, cls, users)]
+
     def set_twilio_numbers(self, twilio_numbers: Optional[Set["TwilioNumber"]]) -> None:
         """Set twilio numbers with proper cleanup"""
         if hasattr(self, 'twilioNumbers') and self.twilioNumbers:
@@ -78,34 +100,97 @@ class User(AuditableBaseModel, table=True):
         """Get full name by combining first and last name"""
         return f"{self.firstName or ''} {self.lastName or ''}".strip()
 
-    def disable_account(self) -> None:
+    def disable_account(self, session: Optional[Session] = None) -> None:
         """Disable account and unassign all twilio numbers"""
         self.isEnabled = False
-        if self.twilioNumbers:
-            for twilio_number in self.twilioNumbers:
-                twilio_number.un_assign()
-    
-    def set_companies(self, companies: Optional[Collection["Company"]]) -> None:
-        """Set companies with proper bidirectional relationship management"""
-        if companies is not None:
-            # Remove this user from existing companies
-            if hasattr(self, 'companies') and self.companies:
-                for company in self.companies:
-                    if hasattr(company, 'users') and company.users and self in company.users:
-                        company.users.remove(self)
-                self.companies.clear()
-            
-            # Add to new companies
-            if not hasattr(self, 'companies'):
-                self.companies = set()
-            
-            self.companies.update(companies)
-            
-            # Add this user to the new companies
-            for company in self.companies:
-                if not hasattr(company, 'users'):
-                    company.users = set()
-                company.users.add(self)
+        session = session or Session.object_session(self)
+        if session is None or self.id is None:
+            if self.twilioNumbers:
+                for twilio_number in self.twilioNumbers:
+                    twilio_number.un_assign()
+            return
+        self._unassign_numbers(session, [self.id])
+        session.expire(self, ["twilioNumbers"])
+
+    @classmethod
+    def disable_accounts(cls, session: Session, user_ids: Collection[int]) -> int:
+        """Disable many accounts and unassign their numbers in two UPDATEs; returns users disabled"""
+        ids = list(user_ids)
+        if not ids:
+            return 0
+        cls._unassign_numbers(session, ids)
+        users = cls.__table__
+        result = session.execute(update(users).where(users.c.id.in_(ids)).values(isEnabled=False))
+        return result.rowcount
+
+    @staticmethod
+    def _unassign_numbers(session: Session, user_ids: List[int]) -> None:
+        # Same effect as TwilioNumber.un_assign, without loading the numbers
+        from app.models.twilio_number import TwilioNumber, mark_routes_stale
+
+        numbers = TwilioNumber.__table__
+        unassigned = session.execute(
+            update(numbers)
+            .where(numbers.c.user.in_(user_ids))
+            .values(user=None, isForwarded=False, forwardedNumber=None)
+            .returning(numbers.c.id)
+        ).scalars()
+        mark_routes_stale(session, unassigned)
+
+    def set_companies(self, companies: Optional[Collection["Company"]],
+                      session: Optional[Session] = None) -> None:
+        """Set companies by diffing user_company rows, without loading company members"""
+        if companies is None:
+            return
+        session = session or Session.object_session(self)
+        if session is None or self.id is None:
+            # Transient user: nothing persisted to diff against yet
+            self.companies = set(companies)
+            return
+        self.set_companies_many(session, {self.id: [company.id for company in companies]})
+        session.expire(self, ["companies"])
+
+    @classmethod
+    def set_companies_many(cls, session: Session, memberships: Mapping[int, Collection[int]]) -> Tuple[int, int]:
+        """
+        Replace the companies of many users at once.
+
+        memberships maps user id -> company ids (empty to drop every membership).
+        Reads the users' current rows once, then issues one DELETE for removed
+        pairs and one INSERT for added ones; returns (removed, added).
+        """
+        if not memberships:
+            return 0, 0
+        link, user_column, company_column = cls._company_link()
+        wanted = {(user_id, company_id) for user_id, company_ids in memberships.items() for company_id in company_ids}
+        current = set(
+            session.execute(
+                select(user_column, company_column).where(user_column.in_(list(memberships)))
+            ).tuples()
+        )
+        removed = current - wanted
+        added = wanted - current
+        if removed:
+            session.execute(delete(link).where(tuple_(user_column, company_column).in_(list(removed))))
+        if added:
+            session.execute(
+                insert(link),
+                [{user_column.name: user_id, company_column.name: company_id} for user_id, company_id in added],
+            )
+        return len(removed), len(added)
+
+    @classmethod
+    def _company_link(cls):
+        """user_company with its (user, company) foreign key columns"""
+        from app.models.company import Company
+
+        link = cls.__table__.metadata.tables["user_company"]
+        columns: Dict[str, object] = {}
+        for column in link.columns:
+            for foreign_key in column.foreign_keys:
+                target = foreign_key.target_fullname.split(".")[0]
+                columns["company" if target == Company.__tablename__ else "user"] = column
+        return link, columns["user"], columns["company"]
     
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', full_name='{self.get_full_name()}')>"
\ No newline at end of file
@@ -1,9 +1,54 @@
-from typing import Optional
+import base64
+import binascii
+import json
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
-from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, and_, event, or_
+from sqlmodel import SQLModel, Field, Session, select
 from app.schemas.voicemail import VoicemailDTO
 from app.utils.date_utility import convert_ms
 
+MAX_INBOX_PAGE_SIZE = 200
+
+
+@lru_cache(maxsize=4096)
+def _format_duration(duration_ms: int):
+    """Durations repeat a lot, so formatted values are memoized"""
+    return convert_ms(duration_ms)
+
+
+def _parse_duration(duration: Optional[str]) -> Optional[int]:
+    """Milliseconds from the stored string, or None when it is not a number"""
+    if not duration:
+        return None
+    try:
+        return int(duration)
+    except ValueError:
+        try:
+            return int(float(duration))
+        except ValueError:
+            return None
+
+
+def encode_inbox_cursor(voicemail: "Voicemail") -> str:
+    date_created = voicemail.dateCreated.isoformat() if voicemail.dateCreated else None
+    position = {"dateCreated": date_created, "id": voicemail.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_inbox_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """Position from a client-supplied cursor; ValueError (a 400 for the caller) when it is not one"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        date_created = position["dateCreated"]
+        voicemail_id = position["id"]
+        if not isinstance(voicemail_id, str):
+            raise TypeError("id must be a string")
+        return (datetime.fromisoformat(date_created) if date_created is not None else None), voicemail_id
+    except (ValueError, KeyError, TypeError, binascii.Error) as exc:
+        raise ValueError("Invalid inbox cursor") from exc
+
 
 class Voicemail(SQLModel, table=True):
     __tablename__ = "voicemail"
@@ -14,12 +59,15 @@ class Voicemail(SQLModel, table=True):
     fromNumber: Optional[str] = Field(default=None, alias="from_number")
     toNumber: Optional[str] = Field(default=None, alias="to_number")
     duration: Optional[str] = Field(default=None, alias="duration")
+    durationMs: Optional[int] = Field(default=None, alias="duration_ms")
     status: Optional[str] = Field(default=None, alias="status")
     callSid: Optional[str] = Field(default=None, alias="call_sid")
     transcriptionSid: Optional[str] = Field(default=None, alias="transcription_sid")
 
     shouldPostOnSlack: bool = Field(default=False, alias="should_post_on_slack")
     hasPostedOnSlack: bool = Field(default=False, alias="has_posted_on_slack")
+    # Failed Slack deliveries; the outbox stops claiming a row past its limit
+    slackAttempts: int = Field(default=0, alias="slack_attempts")
 
     def to_dto(self) -> VoicemailDTO:
         return VoicemailDTO(
@@ -28,12 +76,69 @@ class Voicemail(SQLModel, table=True):
             is_transcript_available=bool(self.transcriptionSid),
             date_created=self.dateCreated,
             from_number=self.fromNumber,
-            duration=convert_ms(int(self.duration)) if self.duration else None,
+            duration=self._formatted_duration(),
         )
 
+    def _formatted_duration(self):
+        duration_ms = self.durationMs if self.durationMs is not None else _parse_duration(self.duration)
+        return _format_duration(duration_ms) if duration_ms is not None else None
+
+    @staticmethod
+    def to_dto_many(voicemails: Sequence["Voicemail"]) -> List[VoicemailDTO]:
+        """Convert many voicemails, reusing formatted durations"""
+        return [voicemail.to_dto() for voicemail in voicemails]
+
+    @classmethod
+    def inbox_page(cls, session: Session, to_number: str, cursor: Optional[str] = None,
+                   limit: int = 50) -> Tuple[List[VoicemailDTO], Optional[str]]:
+        """
+        One page of a number's inbox, newest first, and the cursor for the next page.
+
+        Voicemails without a date come last. Raises ValueError for a malformed cursor.
+        """
+        limit = max(1, min(limit, MAX_INBOX_PAGE_SIZE))
+        query = select(cls).where(cls.toNumber == to_number)
+        if cursor:
+            date_created, voicemail_id = decode_inbox_cursor(cursor)
+            if date_created is None:
+                query = query.where(cls.dateCreated.is_(None), cls.id < voicemail_id)
+            else:
+                query = query.where(or_(
+                    cls.dateCreated < date_created,
+                    and_(cls.dateCreated == date_created, cls.id < voicemail_id),
+                    cls.dateCreated.is_(None),
+                ))
+        # Walks ix_voicemail_inbox (ix_voicemail_inbox_sqlite on SQLite) in order
+        voicemails = session.exec(
+            query.order_by(cls.dateCreated.desc().nulls_last(), cls.id.desc()).limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(voicemails) > limit:
+            voicemails = voicemails[:limit]
+            next_cursor = encode_inbox_cursor(voicemails[-1])
+        return cls.to_dto_many(voicemails), next_cursor
+
     def to_slack_message_dict(self) -> dict:
         return {
             "voicemail_url": self.mediaUrl,
             "caller": self.fromNumber,
             "callee": self.toNumber,
         }
+
+
+# Inbox listing: one number's voicemails, newest first, undated ones last
+Index(
+    "ix_voicemail_inbox", Voicemail.toNumber, Voicemail.dateCreated.desc().nulls_last(), Voicemail.id.desc(),
+).ddl_if(dialect="postgresql")
+# SQLite rejects NULLS LAST in an index, but already sorts NULLs last when descending
+Index(
+    "ix_voicemail_inbox_sqlite", Voicemail.toNumber, Voicemail.dateCreated.desc(), Voicemail.id.desc(),
+).ddl_if(dialect="sqlite")
+
+
+@event.listens_for(Voicemail, "before_insert")
+@event.listens_for(Voicemail, "before_update")
+def _store_duration_ms(mapper, connection, target: Voicemail) -> None:
+    """Keep the integer duration in sync with the string column"""
+    target.durationMs = _parse_duration(target.duration)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Optional
+
+import httpx
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.models.voicemail import Voicemail
+
+SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Delivery outcomes
+POSTED = "posted"
+FAILED = "failed"  # retryable; claimed again by a later batch
+REJECTED = "rejected"  # Slack refused the message; never retried
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str], cap: float) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), capped"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            until = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if until.tzinfo is None:
+            until = until.replace(tzinfo=timezone.utc)
+        seconds = (until - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), cap)
+
+
+class VoicemailSlackOutbox:
+    """
+    Posts pending voicemails to Slack in claimed batches.
+
+    max_attempts bounds the retries of one post within a batch; max_deliveries
+    bounds how many batches may fail a voicemail before it is left alone.
+    Rejected messages (non-retryable status) are retired immediately, so they
+    never block the rows behind them.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], webhook_url: str = SLACK_WEBHOOK_URL,
+                 batch_size: int = 200, concurrency: int = 20, max_attempts: int = 5,
+                 backoff_base: float = 0.5, timeout: float = 10.0, max_deliveries: int = 5,
+                 max_retry_after: float = 30.0):
+        self.session_factory = session_factory
+        self.webhook_url = webhook_url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.max_deliveries = max_deliveries
+        self.max_retry_after = max_retry_after
+
+        self.posted = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.lag_seconds = 0.0
+
+    @staticmethod
+    def claim_batch(session: Session, size: int, max_deliveries: int = 5) -> List[Voicemail]:
+        """Lock up to size pending voicemails, skipping rows other workers hold"""
+        return session.exec(
+            select(Voicemail)
+            .where(Voicemail.shouldPostOnSlack == True)  # noqa: E712
+            .where(Voicemail.hasPostedOnSlack == False)  # noqa: E712
+            .where(Voicemail.slackAttempts < max_deliveries)
+            .order_by(Voicemail.dateCreated)
+            .limit(size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+    @staticmethod
+    def mark_posted(session: Session, voicemail_ids: List[str]) -> None:
+        """Flag a whole batch as posted in one UPDATE"""
+        if voicemail_ids:
+            session.exec(
+                update(Voicemail)
+                .where(Voicemail.id.in_(voicemail_ids))
+                .values(hasPostedOnSlack=True)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def mark_failed(session: Session, voicemail_ids: List[str], retire_at: Optional[int] = None) -> None:
+        """Count a failed delivery; with retire_at, jump straight to that count so the row is never claimed again"""
+        if voicemail_ids:
+            attempts = retire_at if retire_at is not None else Voicemail.slackAttempts + 1
+            session.exec(
+                update(Voicemail)
+                .where(Voicemail.id.in_(voicemail_ids))
+                .values(slackAttempts=attempts)
+                .execution_options(synchronize_session=False)
+            )
+
+    async def _post(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                    voicemail: Voicemail) -> str:
+        try:
+            payload = voicemail.to_slack_message_dict()
+            for attempt in range(1, self.max_attempts + 1):
+                retry_after: Optional[float] = None
+                async with semaphore:
+                    try:
+                        response = await client.post(self.webhook_url, json=payload)
+                        if response.status_code < 300:
+                            return POSTED
+                        if response.status_code not in RETRYABLE_STATUS:
+                            logger.warning("slack rejected voicemail %s: %s", voicemail.id, response.status_code)
+                            return REJECTED
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"), self.max_retry_after)
+                    except httpx.TransportError:
+                        pass
+                if attempt < self.max_attempts:
+                    delay = self.backoff_base * 2 ** (attempt - 1)
+                    await asyncio.sleep(retry_after if retry_after is not None else random.uniform(0, delay))
+            return FAILED
+        except Exception:
+            # One bad voicemail must not abort the batch and repost the others
+            logger.exception("posting voicemail %s failed", voicemail.id)
+            return FAILED
+
+    async def drain_once(self, client: httpx.AsyncClient) -> int:
+        """Claim, post and mark one batch; returns how many were posted"""
+        started = time.perf_counter()
+        with self.session_factory() as session:
+            voicemails = self.claim_batch(session, self.batch_size, self.max_deliveries)
+            if not voicemails:
+                session.rollback()
+                self.lag_seconds = 0.0
+                return 0
+
+            oldest = min((v.dateCreated for v in voicemails if v.dateCreated), default=None)
+            if oldest:
+                # Naive or aware, whichever the column gives back
+                self.lag_seconds = (datetime.now(oldest.tzinfo) - oldest).total_seconds()
+            else:
+                self.lag_seconds = 0.0
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            results = await asyncio.gather(*(self._post(client, semaphore, v) for v in voicemails))
+            outcomes = {POSTED: [], FAILED: [], REJECTED: []}
+            for voicemail, outcome in zip(voicemails, results):
+                outcomes[outcome].append(voicemail.id)
+            posted_ids = outcomes[POSTED]
+
+            # Failed rows stay pending until max_deliveries; rejected ones are retired now
+            self.mark_posted(session, posted_ids)
+            self.mark_failed(session, outcomes[FAILED])
+            self.mark_failed(session, outcomes[REJECTED], retire_at=self.max_deliveries)
+            session.commit()
+
+        self.batches += 1
+        self.posted += len(posted_ids)
+        self.failed += len(outcomes[FAILED])
+        self.rejected += len(outcomes[REJECTED])
+        self.busy_seconds += time.perf_counter() - started
+        return len(posted_ids)
+
+    async def run(self, poll_interval: float = 1.0, stop: Optional[asyncio.Event] = None) -> None:
+        """Drain continuously, sleeping only when nothing is pending"""
+        stop = stop or asyncio.Event()
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as client:
+            while not stop.is_set():
+                if await self.drain_once(client) == 0:
+                    try:
+                        await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+    def metrics(self) -> dict:
+        return {
+            "posted": self.posted,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "throughput_per_second": self.posted / self.busy_seconds if self.busy_seconds else 0.0,
+            "lag_seconds": self.lag_seconds,
+        }
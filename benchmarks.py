@@ -0,0 +1,260 @@
+"""
+Benchmarks for the models' DTO conversions and the Authentication service.
+
+    python benchmarks.py --output bench.json
+    python benchmarks.py --compare bench.json --threshold 0.10
+    python benchmarks.py --suite import --import-budget 0.5
+
+Results are written as JSON (per-operation seconds). With --compare the run
+exits non-zero when any benchmark's median is slower than the baseline by
+more than the threshold; with --import-budget it exits non-zero when
+importing the Authentication app takes longer than the budget in seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+AUTH_DIR = os.path.join(ROOT, "Authentication")
+
+results: Dict[str, dict] = {}
+
+
+def bench(name: str, fn: Callable[[], object], number: int = 1, repeat: int = 5) -> None:
+    """Time fn; number calls per sample, repeat samples, reported per call"""
+    try:
+        fn()  # warm up, and find out whether the code path runs at all
+    except Exception as exc:
+        skip(name, f"{type(exc).__name__}: {exc}")
+        return
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    results[name] = {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "number": number,
+        "repeat": repeat,
+    }
+    print(f"{name:45s} {results[name]['median'] * 1e3:10.3f} ms")
+
+
+def skip(suite: str, reason: str) -> None:
+    results[suite] = {"skipped": reason}
+    print(f"{suite:45s} skipped: {reason}")
+
+
+# DTO conversions
+
+def build_graph(users: int, numbers_per_user: int):
+    """Transient object graph shaped like production data"""
+    from app.models.user import User
+    from app.models.twilio_number import TwilioNumber
+    from app.models.twilio_number_usage import TwilioNumberUsage
+
+    now = datetime.now()
+    graph = []
+    for u in range(users):
+        user = User(id=u, firstName=f"First{u}", lastName=f"Last{u}", email=f"user{u}@example.com",
+                    company="Example", isEnabled=True)
+        numbers = set()
+        for n in range(numbers_per_user):
+            number_id = u * numbers_per_user + n
+            twilio_number = TwilioNumber(id=number_id, phoneNumber=f"+1555{number_id:07d}",
+                                         forwardedNumber=None, isForwarded=False)
+            twilio_number.user = user
+            twilio_number.twilioNumberUsage = TwilioNumberUsage(
+                id=number_id, ownerName=f"Owner{u}",
+                lastIncomingCallDate=now - timedelta(days=n), lastOutgoingCallDate=now - timedelta(days=2 * n),
+                lastIncomingSmsDate=None, lastOutgoingSmsDate=now - timedelta(days=40),
+            )
+            numbers.add(twilio_number)
+        user.twilioNumbers = numbers
+        graph.append(user)
+    return graph
+
+
+def build_usages(rows: int):
+    from app.models.twilio_number_usage import TwilioNumberUsage
+
+    now = datetime.now()
+    return [
+        TwilioNumberUsage(
+            id=i,
+            lastIncomingCallDate=now - timedelta(days=i % 90),
+            lastOutgoingCallDate=None if i % 3 else now - timedelta(days=i % 45),
+            lastIncomingSmsDate=now - timedelta(days=i % 70),
+            lastOutgoingSmsDate=None,
+        )
+        for i in range(rows)
+    ]
+
+
+def bench_models() -> None:
+    try:
+        graph = build_graph(users=200, numbers_per_user=5)
+        usages = build_usages(100_000)
+        from app.models.twilio_number_usage import TwilioNumberUsage
+        from app.models.voicemail import Voicemail
+    except ImportError as exc:
+        skip("models", f"app package not importable ({exc})")
+        return
+    except Exception as exc:
+        # e.g. mappers that fail to configure; the other suites still run
+        skip("models", f"fixtures could not be built ({type(exc).__name__}: {exc})")
+        return
+
+    numbers = [n for user in graph for n in user.twilioNumbers]
+    usage_rows = [n.twilioNumberUsage for n in numbers]
+    voicemails = [
+        Voicemail(id=f"VM{i}", dateCreated=datetime.now(), mediaUrl=f"https://example.com/{i}",
+                  fromNumber="+15550000000", toNumber="+15550000001", duration=str(1000 * (i % 300)))
+        for i in range(1000)
+    ]
+
+    bench("models.user_to_dto[200x5]", lambda: [u.to_dto() for u in graph])
+    bench("models.twilio_number_to_dto[1000]", lambda: [n.to_dto() for n in numbers])
+    bench("models.twilio_number_usage_to_dto[1000]", lambda: [u.to_dto() for u in usage_rows])
+    bench("models.voicemail_to_dto[1000]", lambda: [v.to_dto() for v in voicemails])
+
+    cutoff = datetime.now() - timedelta(days=30)
+    bench("models.compare_with_datetime[100k]", lambda: [u._compare_with_datetime(cutoff) for u in usages])
+    bench("models.refresh_staleness_in_memory[100k]",
+          lambda: TwilioNumberUsage.refresh_staleness_flags_in_memory(usages))
+
+
+# Authentication service
+
+def auth_env(database: str) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{database}"
+    env["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+    env["CREATE_SCHEMA_ON_STARTUP"] = "true"
+    # Benchmark the request path, not the production cost factor
+    env.setdefault("BCRYPT_ROUNDS", "4")
+    return env
+
+
+def bench_http(workdir: str) -> None:
+    os.environ.update(auth_env(os.path.join(workdir, "bench.db")))
+    sys.path.insert(0, AUTH_DIR)
+    try:
+        from fastapi.testclient import TestClient
+        import main
+    except ImportError as exc:
+        skip("http", f"Authentication dependencies not installed ({exc})")
+        return
+
+    with TestClient(main.app) as client:
+        counter = iter(range(10 ** 9))
+
+        def signup():
+            i = next(counter)
+            response = client.post("/auth/signup",
+                                   json={"username": f"bench{i}", "email": f"bench{i}@example.com", "password": "pw"})
+            assert response.status_code == 200, response.text
+
+        for _ in range(500):
+            signup()
+
+        def login():
+            response = client.post("/auth/login", data={"username": "bench1", "password": "pw"})
+            assert response.status_code == 200, response.text
+
+        def list_users():
+            response = client.get("/users", params={"limit": 100})
+            assert response.status_code == 200, response.text
+
+        bench("http.auth_signup", signup, number=20)
+        bench("http.auth_login", login, number=20)
+        bench("http.users[100]", list_users, number=20)
+
+
+def bench_import(workdir: str) -> None:
+    env = auth_env(os.path.join(workdir, "import.db"))
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(5):
+        completed = subprocess.run([sys.executable, "-c", code], cwd=AUTH_DIR, env=env,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            skip("import", completed.stderr.strip().splitlines()[-1])
+            return
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    results["import.authentication_main"] = {
+        "median": statistics.median(samples), "min": min(samples), "max": max(samples),
+        "number": 1, "repeat": len(samples),
+    }
+    print(f"{'import.authentication_main':45s} {statistics.median(samples) * 1e3:10.3f} ms")
+
+
+# Regression comparison
+
+def compare(baseline_path: str, threshold: float) -> int:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    print(f"\n{'benchmark':45s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if "median" not in current or not previous or "median" not in previous:
+            continue
+        change = current["median"] / previous["median"] - 1
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:45s} {previous['median'] * 1e3:9.3f}ms {current['median'] * 1e3:9.3f}ms {change:+8.1%}{flag}")
+    return 1 if regressions else 0
+
+
+SUITES = {"models": bench_models, "http": bench_http, "import": bench_import}
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="run only these suites")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before failing")
+    parser.add_argument("--import-budget", type=float, help="max seconds to import the Authentication app")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for suite in args.suite or ["import", "models", "http"]:
+            if suite == "models":
+                SUITES[suite]()
+            else:
+                SUITES[suite](workdir)
+
+    report = {"created": datetime.now().isoformat(), "python": sys.version.split()[0], "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    status = 0
+    if args.import_budget is not None:
+        imported = results.get("import.authentication_main")
+        if imported is None:
+            print("import budget: import benchmark did not run")
+            status = 1
+        elif imported["median"] > args.import_budget:
+            print(f"import budget exceeded: {imported['median']:.3f}s > {args.import_budget:.3f}s")
+            status = 1
+    if args.compare:
+        status = compare(args.compare, args.threshold) or status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,61 @@
+"""CallRoutingTable kept in sync through its flush/commit listeners"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel
+
+pytest.importorskip("app.models.twilio_number")
+
+from app.models.enums.active_association import ActiveAssociation  # noqa: E402
+from app.models.twilio_number import TwilioNumber  # noqa: E402
+from app.models.user import User  # noqa: E402,F401  (twilio_number.user references it)
+from CallRouting import CallRoutingTable  # noqa: E402
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def routing():
+    # A fresh Session subclass per test, so listeners do not outlive it
+    session_class = type("RoutingSession", (Session,), {})
+    table = CallRoutingTable()
+    table.listen(session_class)
+    return table, session_class
+
+
+def test_committed_number_is_routed(engine, routing):
+    table, RoutingSession = routing
+    with RoutingSession(engine) as session:
+        session.add(TwilioNumber(id=1, phoneNumber="+15550000001", forwardedNumber="+15550000002",
+                                 isForwarded=True, isSupportNumber=True))
+        session.commit()
+    route = table.lookup("+15550000001")
+    assert route.twilioNumberId == 1
+    assert route.activeAssociation == ActiveAssociation.SUPPORT
+    assert route.forwardedNumber == "+15550000002"
+
+
+def test_flushed_changes_apply_only_on_commit(engine, routing):
+    table, RoutingSession = routing
+    with RoutingSession(engine) as session:
+        number = TwilioNumber(id=1, phoneNumber="+15550000001")
+        session.add(number)
+        session.commit()
+        assert table.lookup("+15550000001").activeAssociation == ActiveAssociation.NONE
+
+        number.isDeleted = True
+        session.flush()
+        assert table.lookup("+15550000001") is not None
+        session.rollback()
+    assert table.lookup("+15550000001") is not None
+
+    with RoutingSession(engine) as session:
+        session.get(TwilioNumber, 1).isDeleted = True
+        session.commit()
+    assert table.lookup("+15550000001") is None
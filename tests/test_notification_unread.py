@@ -0,0 +1,72 @@
+"""Unread notification counters on SQLite"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, select
+
+pytest.importorskip("app.models.notification")
+
+from app.models.notification import Notification, NotificationUnreadCount  # noqa: E402
+from NotificationService import fan_out, mark_all_read, rebuild_unread_counts, unread_count  # noqa: E402
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Notification.__table__.create(engine)
+    NotificationUnreadCount.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def counts(session):
+    return {row.notifier: row.unread for row in session.exec(select(NotificationUnreadCount))}
+
+
+def test_fan_out_counts_each_notifier_once(session):
+    fan_out(session, "actor", ["a", "b", "a"], "entity", "post")
+    session.commit()
+    assert counts(session) == {"a": 2, "b": 1}
+
+
+def test_orm_writes_keep_the_counter_in_step(session):
+    first, second = fan_out(session, "actor", ["a", "a"], None, None)
+    session.add(Notification(notifier="b", isRead=True))
+    session.commit()
+    assert counts(session) == {"a": 2}
+
+    first.isRead = True
+    session.commit()
+    assert unread_count(session, "a") == 1
+
+    second.notifier = "b"
+    session.commit()
+    assert counts(session) == {"a": 0, "b": 1}
+
+    session.delete(second)
+    session.commit()
+    assert counts(session) == {"a": 0, "b": 0}
+
+
+def test_mark_all_read_and_rebuild(session):
+    notifications = fan_out(session, None, ["a"] * 3, None, None)
+    session.commit()
+    assert mark_all_read(session, "a", notifications[1].id) == 2
+    session.commit()
+    assert unread_count(session, "a") == 1
+
+    session.exec(NotificationUnreadCount.__table__.update().values(unread=99))
+    rebuild_unread_counts(session)
+    session.commit()
+    assert unread_count(session, "a") == 1
+
+
+def test_counter_never_goes_negative(session):
+    notification = Notification(notifier="a", isRead=False)
+    session.add(notification)
+    session.commit()
+    session.exec(NotificationUnreadCount.__table__.update().values(unread=0))
+    notification.isRead = True
+    session.commit()
+    assert unread_count(session, "a") == 0
@@ -0,0 +1,36 @@
+"""OtpSweeper failure reporting and backoff"""
+import logging
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+pytest.importorskip("app.models.otp")
+
+import OtpStore  # noqa: E402
+from OtpStore import OtpSweeper  # noqa: E402
+
+
+def broken_session():
+    raise OperationalError("connect", {}, Exception("could not translate host name"))
+
+
+def test_failed_sweeps_are_logged_and_back_off(caplog):
+    sweeper = OtpSweeper(broken_session, interval=10, max_backoff=35)
+    with caplog.at_level(logging.ERROR, logger="OtpStore"):
+        delays = []
+        for _ in range(4):
+            sweeper.sweep_once()
+            delays.append(sweeper._next_delay())
+    assert delays == [20, 35, 35, 35]
+    assert sweeper.failures == 4
+    assert len(caplog.records) == 4
+    assert caplog.records[0].exc_info is not None
+
+
+def test_a_successful_sweep_resets_the_backoff(monkeypatch):
+    monkeypatch.setattr(OtpStore, "purge_expired_otps", lambda session_factory, batch_size: 2)
+    sweeper = OtpSweeper(broken_session, interval=10)
+    sweeper.consecutive_failures = 3
+    sweeper.sweep_once()
+    assert sweeper.purged == 2
+    assert sweeper._next_delay() == 10
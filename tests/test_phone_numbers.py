@@ -0,0 +1,51 @@
+"""E.164 normalization and bulk forwarding updates"""
+import pytest
+from sqlmodel import Session
+
+pytest.importorskip("app.models.twilio_number")
+
+from app.models.twilio_number import (  # noqa: E402
+    FORWARDING_CHANGES_KEY, ForwardingUpdate, TwilioNumber, normalize_phone_number,
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("+1 (555) 010-0000", "+15550100000"),
+    ("+44 20 7946 0000", "+442079460000"),
+    ("+91 98765 43210", "+919876543210"),
+    ("+49-30-1234567", "+49301234567"),
+])
+def test_international_numbers_are_normalized(value, expected):
+    assert normalize_phone_number(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "5550100000",     # NANP national
+    "2079460000",     # UK national, without its trunk 0
+    "02079460000",    # UK national
+    "9876543210",     # Indian mobile
+    "00442079460000", # international prefix instead of +
+])
+def test_numbers_without_a_country_code_are_rejected(value):
+    with pytest.raises(ValueError):
+        normalize_phone_number(value)
+
+
+@pytest.mark.parametrize("value", ["+0123456789", "+4420794600001234", "+44 20 abc"])
+def test_invalid_numbers_normalize_to_none(value):
+    assert normalize_phone_number(value) is None
+
+
+def test_bulk_update_rejects_targets_without_a_country_code():
+    # Nothing accepted, so no UPDATE is issued (UPDATE ... FROM VALUES needs Postgres)
+    with Session() as session:
+        results = TwilioNumber.update_forwarding_many(session, [
+            ForwardingUpdate(1, "+44 20 7946 0000", True),
+            ForwardingUpdate(2, "2079460000", True),
+            ForwardingUpdate(1, "9876543210", True),
+        ])
+        assert [(r.twilioNumberId, r.forwardedNumber, r.status) for r in results] == [
+            (1, None, "rejected"),
+            (2, None, "rejected"),
+        ]
+        assert FORWARDING_CHANGES_KEY not in session.info
@@ -0,0 +1,75 @@
+"""UsageIngestor upsert target and retry bookkeeping"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+pytest.importorskip("app.models.twilio_number_usage")
+
+from UsageIngestion import Channel, Direction, UsageIngestor  # noqa: E402
+
+AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class ScriptedSession:
+    """Session double: the id pre-check returns known ids, the upsert does what the script says"""
+
+    def __init__(self, known, upsert):
+        self.known, self.upsert = known, upsert
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def exec(self, statement):
+        if statement.is_select:
+            return type("Result", (), {"all": lambda _: list(self.known)})()
+        if self.upsert is not None:
+            raise self.upsert
+
+    def commit(self):
+        pass
+
+
+def ingestor(*upserts, known=(1,), **options):
+    script = iter(upserts)
+    return UsageIngestor(lambda: ScriptedSession(known, next(script)), **options)
+
+
+def test_upsert_conflicts_on_the_unique_twilio_number_column():
+    sql = str(UsageIngestor._upsert([{"twilioNumberId": 1}]).compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT ("twilioNumber")' in sql
+
+
+def test_retry_counts_are_cleared_once_a_batch_is_written():
+    usage = ingestor(OperationalError("INSERT", {}, Exception("down")), None)
+    usage.record(1, Direction.INCOMING, Channel.CALL, AT)
+    with pytest.raises(OperationalError):
+        usage.flush()
+    assert usage._attempts
+    assert usage.flush() == 1
+    assert usage._attempts == {}
+
+
+def test_retry_counts_are_cleared_when_a_batch_is_dropped():
+    usage = ingestor(IntegrityError("INSERT", {}, Exception("fk")))
+    usage.record(1, Direction.INCOMING, Channel.CALL, AT)
+    with pytest.raises(IntegrityError):
+        usage.flush()
+    assert usage._attempts == {}
+    assert usage.rows_dropped == 1
+
+
+def test_retry_counts_are_cleared_after_max_retries():
+    failure = OperationalError("INSERT", {}, Exception("down"))
+    usage = ingestor(failure, failure, failure, max_retries=2)
+    usage.record(1, Direction.OUTGOING, Channel.SMS, AT)
+    for _ in range(3):
+        with pytest.raises(OperationalError):
+            usage.flush()
+    assert usage._attempts == {}
+    assert usage.metrics()["queue_depth"] == 0
+    assert usage.rows_dropped == 1
@@ -0,0 +1,58 @@
+"""Voicemail.inbox_page keyset pagination and cursor validation"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session
+
+pytest.importorskip("app.models.voicemail")
+
+from app.models.voicemail import Voicemail, decode_inbox_cursor  # noqa: E402
+
+INBOX = "+15550000001"
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Voicemail.__table__.create(engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as session:
+        # VM3 and VM4 share a timestamp; VMa and VMb have no date
+        dates = {"VM1": start, "VM2": start + timedelta(hours=1), "VM3": start + timedelta(hours=2),
+                 "VM4": start + timedelta(hours=2), "VMa": None, "VMb": None}
+        for voicemail_id, date_created in dates.items():
+            session.add(Voicemail(id=voicemail_id, dateCreated=date_created, toNumber=INBOX))
+        session.add(Voicemail(id="VMx", dateCreated=start, toNumber="+15550000009"))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def all_pages(session, limit):
+    ids, cursor = [], None
+    while True:
+        page, cursor = Voicemail.inbox_page(session, INBOX, cursor, limit)
+        ids.append([voicemail.id for voicemail in page])
+        if cursor is None:
+            return ids
+
+
+def test_pages_are_newest_first_with_undated_voicemails_last(session):
+    assert all_pages(session, 10) == [["VM4", "VM3", "VM2", "VM1", "VMb", "VMa"]]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 5])
+def test_paging_neither_skips_nor_repeats(session, limit):
+    pages = all_pages(session, limit)
+    assert [voicemail_id for page in pages for voicemail_id in page] == ["VM4", "VM3", "VM2", "VM1", "VMb", "VMa"]
+    assert all(len(page) <= limit for page in pages)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "e30=", "W10=", "NQ==", "eyJkYXRlQ3JlYXRlZCI6IDUsICJpZCI6ICJ4In0="])
+def test_malformed_cursors_raise_value_error(session, cursor):
+    with pytest.raises(ValueError):
+        decode_inbox_cursor(cursor)
+    with pytest.raises(ValueError):
+        Voicemail.inbox_page(session, INBOX, cursor)
@@ -0,0 +1,110 @@
+"""VoicemailSlackOutbox against a stub Slack webhook (httpx.MockTransport)"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, select
+
+pytest.importorskip("app.models.voicemail")
+
+from app.models.voicemail import Voicemail  # noqa: E402
+from VoicemailSlackOutbox import VoicemailSlackOutbox, parse_retry_after  # noqa: E402
+
+WEBHOOK = "https://hooks.slack.test/webhook"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Voicemail.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+def add_voicemails(engine, count):
+    created = datetime.now(timezone.utc) - timedelta(minutes=count)
+    with Session(engine) as session:
+        for i in range(count):
+            session.add(Voicemail(id=f"VM{i}", dateCreated=created + timedelta(minutes=i),
+                                  mediaUrl=f"https://example.com/{i}", fromNumber="+15550000000",
+                                  toNumber="+15550000001", duration="1000", shouldPostOnSlack=True))
+        session.commit()
+
+
+def drain(engine, handler, rounds=10, **options):
+    outbox = VoicemailSlackOutbox(lambda: Session(engine), webhook_url=WEBHOOK, backoff_base=0, **options)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(rounds):
+                await outbox.drain_once(client)
+            return outbox
+
+    return asyncio.run(run())
+
+
+def posted_ids(engine):
+    with Session(engine) as session:
+        return sorted(v.id for v in session.exec(select(Voicemail).where(Voicemail.hasPostedOnSlack == True)))  # noqa: E712
+
+
+def test_mark_posted_flags_every_delivered_voicemail(engine):
+    add_voicemails(engine, 5)
+    outbox = drain(engine, lambda request: httpx.Response(200), batch_size=2)
+    assert posted_ids(engine) == [f"VM{i}" for i in range(5)]
+    assert outbox.metrics()["posted"] == 5
+
+
+def test_retries_rate_limited_posts(engine):
+    add_voicemails(engine, 1)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        return httpx.Response(200)
+
+    drain(engine, handler)
+    assert len(calls) == 3
+    assert posted_ids(engine) == ["VM0"]
+
+
+def test_rejected_voicemails_do_not_block_newer_ones(engine):
+    add_voicemails(engine, 6)
+    poison = {"https://example.com/0", "https://example.com/1"}
+
+    def handler(request):
+        if json.loads(request.content)["voicemail_url"] in poison:
+            return httpx.Response(400)
+        return httpx.Response(200)
+
+    outbox = drain(engine, handler, batch_size=2)
+    assert posted_ids(engine) == ["VM2", "VM3", "VM4", "VM5"]
+    assert outbox.metrics()["rejected"] == 2
+    with Session(engine) as session:
+        assert VoicemailSlackOutbox.claim_batch(session, 10) == []
+
+
+def test_failing_posts_give_up_after_max_deliveries(engine):
+    add_voicemails(engine, 1)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    drain(engine, handler, max_attempts=2, max_deliveries=3)
+    assert len(calls) == 6
+    assert posted_ids(engine) == []
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2", cap=30) == 2.0
+    assert parse_retry_after("120", cap=30) == 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", cap=30) == 0.0
+    assert parse_retry_after("soon", cap=30) is None